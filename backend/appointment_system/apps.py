@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class AppointmentSystemConfig(AppConfig):
+    name = 'appointment_system'
+    
+    def ready(self):
+        from django.conf import settings
+        from .instrumentation import instrument_drf
+        if settings.PERF_DRF_TIMERS:
+            instrument_drf()
@@ -0,0 +1,81 @@
+"""
+Helpers shared by the bench_* management commands.
+"""
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from django.db import connection
+
+
+@contextmanager
+def scratch_database(name=None):
+    """Run the block against a freshly migrated throwaway database.
+
+    ``name`` overrides the test database name, e.g. a file path when the benchmark
+    needs several connections to share a SQLite database.
+    """
+    if name:
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = name
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def api_client(user=None):
+    """An in-process DRF test client, optionally force-authenticated as ``user``."""
+    from rest_framework.test import APIClient
+
+    # 'testserver' is only an allowed host under the test runner
+    client = APIClient(SERVER_NAME='localhost')
+    if user is not None:
+        client.force_authenticate(user)
+    return client
+
+
+def next_weekday(weekday=0):
+    day = date.today() + timedelta(days=1)
+    while day.weekday() != weekday:
+        day += timedelta(days=1)
+    return day
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples):
+    """Latency summary in milliseconds for a list of millisecond samples."""
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'mean': sum(ordered) / len(ordered) if ordered else 0.0,
+        'p50': percentile(ordered, 50),
+        'p95': percentile(ordered, 95),
+        'p99': percentile(ordered, 99),
+        'max': ordered[-1] if ordered else 0.0,
+    }
+
+
+def measure(fn, repeat):
+    """Call ``fn`` ``repeat`` times and summarize its latency."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples)
+
+
+def seed(doctors=100, patients=1000, appointments=20000, days=60, rng_seed=0):
+    """Bulk-create a synthetic directory with ``appointments`` spread over ``days`` around today."""
+    from .seeding import generate
+
+    return generate(
+        doctors, patients, appointments,
+        past_days=days // 2, future_days=days - days // 2, rng_seed=rng_seed
+    )
@@ -0,0 +1,122 @@
+"""
+Per-request timing collected by PerformanceMiddleware.
+
+collect() makes a RequestTimings the active one for the request. Every
+database connection carries an execute_wrapper that reports to the active
+RequestTimings, which is held in a context variable so that queries run in
+sync_to_async threads count toward the async request that made them.
+timer() adds to a named timer on it; instrument_drf() uses that to time
+serializer output ('serialize') and authentication ('auth'). Outside a
+request nothing is recorded.
+"""
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    def __init__(self, sql_limit):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.timers = {}
+        # The first sql_limit statements, without parameters, for the slow-request log
+        self.sql = []
+        self.sql_limit = sql_limit
+        self._running = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.queries += 1
+            self.db_ms += elapsed
+            if len(self.sql) < self.sql_limit:
+                self.sql.append({'sql': sql, 'ms': round(elapsed, 3)})
+
+    def server_timing(self, total_ms):
+        entries = [f'total;dur={total_ms:.1f}', f'db;dur={self.db_ms:.1f};desc="{self.queries} queries"']
+        entries += [f'{name};dur={ms:.1f}' for name, ms in self.timers.items()]
+        return ', '.join(entries)
+
+
+def _report(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    return timings(execute, sql, params, many, context)
+
+
+def install(connection):
+    """Add the timing execute_wrapper to ``connection``; safe to call repeatedly."""
+    if _report not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _report)
+
+
+def _connection_created(sender, connection, **kwargs):
+    install(connection)
+
+
+connection_created.connect(_connection_created)
+
+
+@contextmanager
+def collect(sql_limit):
+    # Connections of this thread may have connected before the signal handler existed
+    for alias in connections:
+        install(connections[alias])
+    timings = RequestTimings(sql_limit)
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def timer(name):
+    """Add the block's duration to the active request's ``name`` timer; nested uses count once."""
+    timings = _current.get()
+    if timings is None or name in timings._running:
+        yield
+        return
+    timings._running.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.timers[name] = timings.timers.get(name, 0.0) + (time.perf_counter() - started) * 1000
+        timings._running.discard(name)
+
+
+def timed(name, func):
+    if getattr(func, 'timer_name', None) == name:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with timer(name):
+            return func(*args, **kwargs)
+    wrapper.timer_name = name
+    return wrapper
+
+
+def instrument_drf():
+    """Time serializer output and authentication in every DRF view.
+
+    Patches DRF's classes, so it runs once at startup from AppointmentSystemConfig.ready()
+    when PERF_DRF_TIMERS is set; calling it again changes nothing.
+    """
+    from rest_framework import serializers, views
+
+    # .data is where a serializer renders its instance, including the queries that triggers
+    for serializer_class in (serializers.Serializer, serializers.ListSerializer):
+        data = serializer_class.__dict__['data']
+        serializer_class.data = property(timed('serialize', data.fget))
+    views.APIView.perform_authentication = timed('auth', views.APIView.perform_authentication)
@@ -0,0 +1,83 @@
+"""
+Logging plumbing configured from settings.LOGGING.
+
+QueueLogHandler only enqueues records; a QueueListener thread formats and
+writes them, so a slow stream never blocks a request. RedactFilter masks
+sensitive fields in mapping arguments before a record leaves the request
+thread, and JsonFormatter renders one JSON object per line.
+"""
+import json
+import logging
+import queue
+from collections.abc import Mapping
+from logging.handlers import QueueHandler, QueueListener
+
+REDACTED = '[redacted]'
+SENSITIVE_FIELDS = {'password', 'password_confirm', 'old_password', 'new_password', 'token', 'access', 'refresh', 'authorization'}
+
+# Attributes every LogRecord has; anything else was passed with extra=
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def redact(value):
+    if isinstance(value, Mapping):
+        return {key: REDACTED if str(key).lower() in SENSITIVE_FIELDS else redact(item) for key, item in value.items()}
+    return value
+
+
+class RedactFilter(logging.Filter):
+    """Mask sensitive keys in mapping arguments and extra fields."""
+
+    def filter(self, record):
+        if isinstance(record.args, Mapping):
+            record.args = redact(record.args)
+        elif record.args:
+            record.args = tuple(redact(arg) for arg in record.args)
+        for key in set(vars(record)) - RECORD_ATTRIBUTES:
+            value = getattr(record, key)
+            setattr(record, key, REDACTED if key.lower() in SENSITIVE_FIELDS else redact(value))
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update((key, getattr(record, key)) for key in set(vars(record)) - RECORD_ATTRIBUTES)
+        if record.exc_info or record.exc_text:
+            entry['exc_info'] = record.exc_text or self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class QueueLogHandler(QueueHandler):
+    """Hand records to a background thread that formats them and writes them to ``stream``.
+
+    The formatter configured for this handler is used by the writing handler.
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        self.target = logging.StreamHandler(stream)
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Records stay in this process, so the message is left for the listener to
+        # format. Only a traceback is rendered now, while its frames are still current.
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def close(self):
+        # logging.shutdown() closes handlers at exit; stopping drains the queue first
+        if self.listener._thread is not None:
+            self.listener.stop()
+        super().close()
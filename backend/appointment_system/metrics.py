@@ -0,0 +1,260 @@
+"""
+Prometheus metrics served at /metrics, without a client library.
+
+Every metric keeps one dict of values per thread, so recording a sample is a
+plain dict update with no lock; a scrape sums the per-thread dicts, and the
+dicts of threads that have finished are folded into one retired total. Under a
+multi-process WSGI server set METRICS_DIR to a directory the workers share:
+each process writes its totals to <pid>.json there at most every
+METRICS_FLUSH_SECONDS (and on exit), and a scrape of any worker merges all of
+the files. Gauges only count processes that are still running.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY = {}
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        # (thread, values) for every thread that has recorded a sample
+        self._shards = []
+        # Values recorded by threads that have since finished
+        self._retired = {}
+        # Only taken when a thread records its first sample, and by collect()
+        self._lock = threading.Lock()
+        REGISTRY[name] = self
+
+    def _shard(self):
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                self._retire_finished()
+                self._shards.append((threading.current_thread(), values))
+            return values
+
+    def _retire_finished(self):
+        # Called with the lock held. A finished thread records nothing more, so
+        # fold its values into the retired total and drop its shard; otherwise a
+        # server that starts a thread per request would keep one shard per request.
+        live = []
+        for thread, values in self._shards:
+            if thread.is_alive():
+                live.append((thread, values))
+                continue
+            for key, value in values.items():
+                self._retired[key] = self.merge(self._retired.get(key), value)
+        self._shards = live
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def merge(self, total, value):
+        return value if total is None else total + value
+
+    def collect(self):
+        """Values by label tuple, summed over every thread of this process."""
+        with self._lock:
+            self._retire_finished()
+            shards = [values for _, values in self._shards]
+            totals = {key: self.merge(None, value) for key, value in self._retired.items()}
+        for shard in shards:
+            for key, value in shard.copy().items():
+                totals[key] = self.merge(totals.get(key), value)
+        return totals
+
+    def samples(self, key, value):
+        yield self.name, list(zip(self.labelnames, key)), value
+
+    def render(self, totals):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for key in sorted(totals):
+            for name, pairs, value in self.samples(key, totals[key]):
+                lines.append(f'{name}{_labels(pairs)} {value!r}')
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def render(self, totals):
+        # Unlabelled counters and gauges start out at zero rather than missing
+        return super().render(totals or ({(): 0} if not self.labelnames else {}))
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        # One count per bucket plus the +Inf overflow, then the sum and the count
+        entry = shard.get(key)
+        if entry is None:
+            entry = shard[key] = [0] * (len(self.buckets) + 3)
+        entry[bisect_left(self.buckets, value)] += 1
+        entry[-2] += value
+        entry[-1] += 1
+
+    def merge(self, total, value):
+        if total is None:
+            return list(value)
+        return [a + b for a, b in zip(total, value)]
+
+    def samples(self, key, value):
+        pairs = list(zip(self.labelnames, key))
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), value):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(float(bound))
+            yield f'{self.name}_bucket', pairs + [('le', le)], cumulative
+        yield f'{self.name}_sum', pairs, float(value[-2])
+        yield f'{self.name}_count', pairs, value[-1]
+
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Request latency by route', ['method', 'route']
+)
+REQUESTS = Counter('http_requests_total', 'Requests served by route and status', ['method', 'route', 'status'])
+IN_FLIGHT = Gauge('http_requests_in_flight', 'Requests currently being served')
+DB_QUERIES = Counter('http_db_queries_total', 'Database queries run while serving requests, by route', ['route'])
+BOOKINGS = Counter('appointments_booked_total', 'Appointments created')
+BOOKING_CONFLICTS = Counter(
+    'appointments_booking_conflicts_total', 'Bookings rejected because the slot was taken or the schedule was busy'
+)
+CANCELLATIONS = Counter('appointments_cancelled_total', 'Appointments cancelled through the cancel endpoint')
+SLOT_CACHE = Counter('slot_cache_requests_total', 'Free slot lookups by cache result', ['result'])
+LOGINS = Counter('logins_total', 'Login attempts by result', ['result'])
+
+
+_flush_lock = threading.Lock()
+_last_flush = 0.0
+
+
+def flush(force=False):
+    """Write this process's totals to METRICS_DIR, at most every METRICS_FLUSH_SECONDS unless forced."""
+    global _last_flush
+    directory = settings.METRICS_DIR
+    if not directory:
+        return
+    now = time.monotonic()
+    if not force and now - _last_flush < settings.METRICS_FLUSH_SECONDS:
+        return
+    # Another thread already writing is as good as writing now
+    if not _flush_lock.acquire(blocking=force):
+        return
+    try:
+        _last_flush = now
+        data = {name: [[list(key), value] for key, value in metric.collect().items()] for name, metric in REGISTRY.items()}
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(data, f)
+        os.replace(path + '.tmp', path)
+    finally:
+        _flush_lock.release()
+
+
+atexit.register(flush, True)
+
+
+def _running(pid):
+    if os.name != 'posix':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def gather():
+    """Totals by metric name, for this process or for every process writing to METRICS_DIR."""
+    directory = settings.METRICS_DIR
+    if not directory:
+        return {name: metric.collect() for name, metric in REGISTRY.items()}
+
+    flush(force=True)
+    totals = {name: {} for name in REGISTRY}
+    for filename in os.listdir(directory):
+        pid, _, extension = filename.partition('.')
+        if extension != 'json' or not pid.isdigit():
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        running = _running(int(pid))
+        for name, values in data.items():
+            metric = REGISTRY.get(name)
+            if metric is None or (metric.kind == 'gauge' and not running):
+                continue
+            for key, value in values:
+                key = tuple(key)
+                totals[name][key] = metric.merge(totals[name].get(key), value)
+    return totals
+
+
+def render():
+    totals = gather()
+    lines = []
+    for name, metric in REGISTRY.items():
+        lines += metric.render(totals.get(name, {}))
+    return '\n'.join(lines) + '\n'
+
+
+@require_GET
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+        return HttpResponse('Unauthorized\n', status=401, content_type='text/plain')
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,178 @@
+"""
+Project-wide middleware.
+"""
+import hashlib
+import logging
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from . import metrics
+from .instrumentation import collect
+from .routers import replica_aliases, replica_reads, enable_replica_reads
+
+logger = logging.getLogger('appointment_system.performance')
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Set on clients that wrote recently, so they read from the primary
+PINNED_COOKIE = 'db_pinned'
+
+
+def _pin_key(request):
+    # Token clients don't keep cookies, so pin them by their Authorization header
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if authorization:
+        return 'db:pinned:' + hashlib.sha1(authorization.encode()).hexdigest()
+    return None
+
+
+def _uses_replica(view_func):
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    return getattr(view_func, 'use_replica', False) or getattr(view_class, 'use_replica', False)
+
+
+class ReplicaRoutingMiddleware:
+    """Serve the reads of use_replica() views from the read replicas.
+
+    A client whose write succeeded is pinned to the primary for
+    REPLICA_STICKY_SECONDS so it reads its own writes despite replication lag.
+    Runs natively under both WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # The async handler awaits view middleware; a sync one would cost a thread hop
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.acall(request)
+        if not replica_aliases():
+            return self.get_response(request)
+
+        with replica_reads(False):
+            response = self.get_response(request)
+
+        key = self.pin(request, response)
+        if key:
+            cache.set(key, True, settings.REPLICA_STICKY_SECONDS)
+        return response
+
+    async def acall(self, request):
+        if not replica_aliases():
+            return await self.get_response(request)
+
+        with replica_reads(False):
+            response = await self.get_response(request)
+
+        key = self.pin(request, response)
+        if key:
+            await cache.aset(key, True, settings.REPLICA_STICKY_SECONDS)
+        return response
+
+    def pin(self, request, response):
+        # Sets the pin cookie after a successful write; returns the cache key that pins token clients
+        if request.method in SAFE_METHODS or response.status_code >= 400:
+            return None
+        response.set_cookie(PINNED_COOKIE, '1', max_age=settings.REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax')
+        return _pin_key(request)
+
+    def may_use_replica(self, request, view_func):
+        return (
+            request.method in SAFE_METHODS and _uses_replica(view_func) and replica_aliases()
+            and PINNED_COOKIE not in request.COOKIES
+        )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.may_use_replica(request, view_func):
+            key = _pin_key(request)
+            if not (key and cache.get(key)):
+                enable_replica_reads()
+        return None
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        if self.may_use_replica(request, view_func):
+            key = _pin_key(request)
+            if not (key and await cache.aget(key)):
+                enable_replica_reads()
+        return None
+
+
+class PerformanceMiddleware:
+    """Time each request: total, database (query count and time), serialization and auth.
+
+    The timings go out as a Server-Timing header when PERF_SERVER_TIMING is set,
+    as a structured DEBUG log line and as per-route /metrics. Requests slower
+    than PERF_SLOW_REQUEST_MS are logged at WARNING with the SQL they ran. Runs
+    natively under both WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.acall(request)
+        started = time.perf_counter()
+        metrics.IN_FLIGHT.inc()
+        try:
+            with collect(settings.PERF_SQL_CAPTURE_LIMIT) as timings:
+                response = self.get_response(request)
+        finally:
+            metrics.IN_FLIGHT.dec()
+        return self.finish(request, response, timings, started)
+
+    async def acall(self, request):
+        started = time.perf_counter()
+        metrics.IN_FLIGHT.inc()
+        try:
+            with collect(settings.PERF_SQL_CAPTURE_LIMIT) as timings:
+                response = await self.get_response(request)
+        finally:
+            metrics.IN_FLIGHT.dec()
+        return self.finish(request, response, timings, started)
+
+    def finish(self, request, response, timings, started):
+        total_ms = (time.perf_counter() - started) * 1000
+        self.record_metrics(request, response, total_ms, timings.queries)
+
+        if settings.PERF_SERVER_TIMING:
+            response['Server-Timing'] = timings.server_timing(total_ms)
+
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(total_ms, 2),
+            'db_ms': round(timings.db_ms, 2),
+            'queries': timings.queries,
+            **{f'{name}_ms': round(ms, 2) for name, ms in timings.timers.items()},
+        }
+        if total_ms >= settings.PERF_SLOW_REQUEST_MS:
+            logger.warning(
+                'Slow request %s %s: %.1f ms, %d queries', request.method, request.path, total_ms, timings.queries,
+                extra={**fields, 'sql': timings.sql}
+            )
+        else:
+            logger.debug('%s %s %s %.1f ms', request.method, request.path, response.status_code, total_ms, extra=fields)
+        return response
+
+    def record_metrics(self, request, response, total_ms, queries):
+        # The URL pattern rather than the path, so ids don't make a series each
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match else 'unmatched'
+        metrics.REQUEST_LATENCY.observe(total_ms / 1000, method=request.method, route=route)
+        metrics.REQUESTS.inc(method=request.method, route=route, status=response.status_code)
+        metrics.DB_QUERIES.inc(queries, route=route)
+        metrics.flush()
@@ -0,0 +1,30 @@
+"""
+Cursor pagination for the list endpoints.
+"""
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class BaseCursorPagination(CursorPagination):
+    page_size = settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.MAX_PAGE_SIZE
+
+
+class AppointmentCursorPagination(BaseCursorPagination):
+    # id breaks ties between appointments in the same slot across doctors
+    ordering = ('appointment_date', 'appointment_time', 'id')
+
+
+class DoctorCursorPagination(BaseCursorPagination):
+    ordering = ('id',)
+    # Accepted ?ordering= values; the trailing id breaks ties between equal fees/experience
+    orderings = {
+        'fee': ('consultation_fee', 'id'),
+        '-fee': ('-consultation_fee', '-id'),
+        'experience': ('experience_years', 'id'),
+        '-experience': ('-experience_years', '-id'),
+    }
+
+    def get_ordering(self, request, queryset, view):
+        return self.orderings.get(request.query_params.get('ordering'), self.ordering)
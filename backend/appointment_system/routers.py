@@ -0,0 +1,57 @@
+"""
+Read-replica routing.
+
+Every alias in settings.DATABASES other than 'default' is a replica. Reads go
+to a replica only while a request for a view marked with use_replica() is
+being served (see middleware.ReplicaRoutingMiddleware); everything else,
+and every write, goes to the primary.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def use_replica(view):
+    """Mark a view function or class as safe to serve from a read replica."""
+    view.use_replica = True
+    return view
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias != 'default']
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Route reads inside the block to the replicas (or, with ``enabled=False``, to the primary)."""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def enable_replica_reads():
+    # For the middleware, which sets the flag in process_view and resets it around the whole request
+    _replica_reads.set(True)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get():
+            replicas = replica_aliases()
+            if replicas:
+                return random.choice(replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        # Later reads in the same request must see this write
+        _replica_reads.set(False)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
@@ -0,0 +1,179 @@
+"""
+Deterministic synthetic data for development and benchmarking.
+
+generate() bulk-creates specializations, doctors with weekly schedules,
+patients and appointment history around today. The same arguments and seed
+produce the same rows, relative to the day they are run. Appointments are
+streamed to the database in batches, so memory stays flat at any volume.
+"""
+import random
+from datetime import date, time, timedelta
+from itertools import islice
+from django.db import connection, transaction
+from django.utils import timezone
+from appointments.models import Appointment
+from appointments.slots import SLOT_MINUTES, date_range, from_minutes, schedule_slots
+from doctors.models import Doctor, DoctorAvailability, Specialization
+from doctors.search import refresh_search_documents
+from users.models import CustomUser
+
+SPECIALIZATIONS = [
+    'Cardiology', 'Dermatology', 'Neurology', 'Pediatrics', 'Orthopedics',
+    'Psychiatry', 'Ophthalmology', 'Gastroenterology', 'Oncology', 'General Practice',
+]
+FIRST_NAMES = [
+    'James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+    'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Carlos', 'Aisha',
+    'Wei', 'Priya', 'Olusegun', 'Yuki', 'Mateo', 'Fatima', 'Ivan', 'Chloe', 'Ahmed', 'Sofia',
+]
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+    'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin',
+    'Lee', 'Perez', 'Thompson', 'White', 'Harris', 'Sanchez', 'Clark', 'Ramirez', 'Lewis', 'Robinson',
+    'Nguyen', 'Patel', 'Kim', 'Chen', 'Okafor', 'Tanaka', 'Novak', 'Schmidt', 'Rossi', 'Haddad',
+]
+BIO_TOPICS = [
+    'sports injuries', 'heart failure', 'hypertension', 'migraine', 'eczema', 'acne', 'diabetes',
+    'asthma', 'sleep disorders', 'anxiety', 'depression', 'cataracts', 'back pain', 'arthritis',
+    'allergies', 'preventive care', 'geriatrics', 'adolescent health', 'nutrition', 'chronic pain',
+]
+SYMPTOMS = ['', '', 'Headache', 'Chest pain', 'Rash', 'Persistent cough', 'Back pain', 'Follow-up visit', 'Fatigue']
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+# Weekly schedules handed out to doctors: (working days, working intervals)
+SCHEDULES = [
+    (WEEKDAYS[:5], [(time(9), time(17))]),
+    (WEEKDAYS[:5], [(time(8), time(12)), (time(13), time(17))]),
+    (WEEKDAYS[1:6], [(time(10), time(18))]),
+]
+
+# (statuses, weights) for appointments before today and from today on
+PAST_STATUSES = (['completed', 'cancelled', 'no_show'], [75, 15, 10])
+FUTURE_STATUSES = (['confirmed', 'pending', 'cancelled'], [55, 30, 15])
+
+APPOINTMENT_FIELDS = [
+    'patient', 'doctor', 'appointment_date', 'appointment_time', 'status', 'symptoms', 'notes',
+    'duration_minutes', 'created_at', 'updated_at',
+]
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def schedule_calendar(schedule, start, end):
+    """(date, database date, database time) of every slot ``schedule`` offers between two dates."""
+    days, intervals = schedule
+    times = [connection.ops.adapt_timefield_value(from_minutes(minute)) for minute in schedule_slots(intervals)]
+    return [
+        (day, connection.ops.adapt_datefield_value(day), slot_time)
+        for day in date_range(start, end) if WEEKDAYS[day.weekday()] in days
+        for slot_time in times
+    ]
+
+
+def insert_rows(model, fields, rows, batch_size, log):
+    """INSERT tuples of database-ready values for ``fields`` with executemany, a batch per transaction.
+
+    At millions of rows bulk_create spends most of its time preparing each value
+    through its field; these rows are already adapted, so that step is skipped.
+    """
+    sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+        connection.ops.quote_name(model._meta.db_table),
+        ', '.join(connection.ops.quote_name(model._meta.get_field(field).column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    created = 0
+    for batch in batched(rows, batch_size):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, batch)
+        created += len(batch)
+        if created % (batch_size * 10) == 0:
+            log(f'{created} {model._meta.verbose_name_plural.lower()}')
+    return created
+
+
+def generate(doctors, patients, appointments, past_days=180, future_days=30, rng_seed=0,
+             password='!', batch_size=10000, log=None):
+    """Bulk-create a synthetic directory and appointment history; returns (doctor rows, patient rows).
+
+    ``password`` is stored as every user's password hash, so callers hash once
+    (the default makes the accounts unusable). Appointments are spread unevenly
+    over doctors and dated from ``past_days`` ago to ``future_days`` ahead;
+    their statuses follow PAST_STATUSES or FUTURE_STATUSES by date.
+    """
+    log = log or (lambda message: None)
+    rng = random.Random(rng_seed)
+
+    with transaction.atomic():
+        specializations = Specialization.objects.bulk_create(
+            Specialization(name=name) for name in SPECIALIZATIONS
+        )
+        users = CustomUser.objects.bulk_create([
+            CustomUser(
+                username=f'doctor{i}', user_type='doctor', password=password,
+                first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+            )
+            for i in range(doctors)
+        ] + [
+            CustomUser(
+                username=f'patient{i}', user_type='user', password=password,
+                first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+            )
+            for i in range(patients)
+        ], batch_size=batch_size)
+        log(f'{len(users)} users')
+
+        schedules = [rng.randrange(len(SCHEDULES)) for _ in range(doctors)]
+        doctor_rows = Doctor.objects.bulk_create([
+            Doctor(
+                user=user,
+                specialization=rng.choice(specializations),
+                license_number=f'LIC{i}',
+                experience_years=rng.randint(0, 40),
+                consultation_fee=rng.randint(20, 300),
+                bio=f'Special interest in {rng.choice(BIO_TOPICS)} and {rng.choice(BIO_TOPICS)}.',
+            )
+            for i, user in enumerate(users[:doctors])
+        ], batch_size=batch_size)
+        DoctorAvailability.objects.bulk_create([
+            DoctorAvailability(doctor=doctor, day=day, start_time=start_time, end_time=end_time)
+            for doctor, schedule in zip(doctor_rows, schedules)
+            for day in SCHEDULES[schedule][0]
+            for start_time, end_time in SCHEDULES[schedule][1]
+        ], batch_size=batch_size)
+        # bulk_create skips the signals that keep search documents current
+        refresh_search_documents()
+        log(f'{len(doctor_rows)} doctors')
+
+    patient_rows = users[doctors:]
+    if not (appointments and doctor_rows and patient_rows):
+        return doctor_rows, patient_rows
+
+    today = date.today()
+    calendars = [
+        schedule_calendar(schedule, today - timedelta(days=past_days), today + timedelta(days=future_days - 1))
+        for schedule in SCHEDULES
+    ]
+    # Some doctors are much busier than others; none is booked past capacity
+    weights = [rng.uniform(0.3, 1.7) for _ in doctor_rows]
+    scale = appointments / sum(weights)
+    patient_ids = [patient.id for patient in patient_rows]
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+
+    def rows():
+        for doctor, schedule, weight in zip(doctor_rows, schedules, weights):
+            calendar = calendars[schedule]
+            for day, db_day, db_time in sorted(rng.sample(calendar, min(len(calendar), round(weight * scale)))):
+                statuses, status_weights = PAST_STATUSES if day < today else FUTURE_STATUSES
+                yield (
+                    rng.choice(patient_ids), doctor.id, db_day, db_time,
+                    rng.choices(statuses, status_weights)[0], rng.choice(SYMPTOMS), '', SLOT_MINUTES, now, now,
+                )
+
+    created = insert_rows(Appointment, APPOINTMENT_FIELDS, rows(), batch_size, log)
+    log(f'{created} appointments')
+    return doctor_rows, patient_rows
@@ -3,6 +3,7 @@ Django settings for appointment_system project.
 """
 
 from pathlib import Path
+import importlib.util
 import os
 from datetime import timedelta
 
@@ -32,14 +33,18 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
+    'appointment_system',
     'users',
     'appointments',
     'doctors',
 ]
 
 MIDDLEWARE = [
+    'appointment_system.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'appointment_system.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -73,12 +78,109 @@ WSGI_APPLICATION = 'appointment_system.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
+# Configured from the environment: DB_ENGINE is 'sqlite' (the default) or 'postgres'.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+# Seconds a connection is kept open for reuse by later requests; 0 closes it after each request
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+
+# Applied to every new SQLite connection.
+SQLITE_PRAGMAS = [
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-20000',
+    'PRAGMA mmap_size=134217728',
+]
+# WAL lets readers run alongside the single writer, and synchronous=NORMAL is
+# durable under WAL except on power loss. WAL mode is stored in the database file
+# and keeps -wal/-shm files beside it, so the bundled development database (used
+# when DB_NAME is unset) stays in rollback-journal mode unless DB_SQLITE_WAL=1.
+SQLITE_WAL_PRAGMAS = ['PRAGMA journal_mode=WAL', 'PRAGMA synchronous=NORMAL']
+SQLITE_WAL = os.environ.get('DB_SQLITE_WAL', '1' if os.environ.get('DB_NAME') else '0') == '1'
+SQLITE_INIT_COMMAND = ';'.join((SQLITE_WAL_PRAGMAS if SQLITE_WAL else []) + SQLITE_PRAGMAS)
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'appointment_system'),
+            'USER': os.environ.get('DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            # Persistent connections are pinged before reuse so a dropped one is replaced
+            'CONN_HEALTH_CHECKS': True,
+            # Behind PgBouncer in transaction mode server-side cursors can't span transactions
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_PGBOUNCER') == '1',
+            'OPTIONS': {
+                'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'appointment_system.sqlite_backend',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'OPTIONS': {
+                # Seconds a writer waits for the lock (SQLite's busy timeout)
+                'timeout': float(os.environ.get('DB_BUSY_TIMEOUT', 20)),
+                # Take the write lock at BEGIN; upgrading a read lock mid-transaction
+                # fails immediately instead of waiting out the busy timeout
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': SQLITE_INIT_COMMAND,
+            },
+        }
+    }
+
+# Read replicas: DB_REPLICAS is a comma-separated list of Postgres hosts, or of
+# SQLite files for local testing. They become the aliases replica1, replica2, ...
+# Tests run them as mirrors of the default test database.
+DB_REPLICAS = [replica for replica in os.environ.get('DB_REPLICAS', '').split(',') if replica]
+for index, replica in enumerate(DB_REPLICAS, 1):
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        ('HOST' if DB_ENGINE == 'postgres' else 'NAME'): replica,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['appointment_system.routers.ReplicaRouter']
+
+# Seconds a client reads from the primary after a successful write. Token
+# clients are pinned through the cache, so with replicas and more than one
+# worker process CACHE_BACKEND must be a shared cache (Redis, Memcached).
+REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# The per-process local-memory default suits a single worker. Multi-process
+# deployments should share one cache so invalidations, throttles and replica
+# pins reach every worker, e.g.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache CACHE_LOCATION=redis://127.0.0.1:6379/1
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'appointment-system'),
     }
 }
+if CACHE_BACKEND.endswith('LocMemCache'):
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': 10000}
+
+# Seconds a cached public directory response may be served; signal-based
+# invalidation normally replaces entries well before this
+DIRECTORY_CACHE_TIMEOUT = 60 * 15
+
+# Seconds a cached per-doctor, per-day slot bitmap lives; bookings update
+# entries in place, so this only bounds staleness from lost updates
+SLOT_CACHE_TIMEOUT = 60 * 5
+
+# Weeks of each doctor's schedule materialized into ScheduleBlock rows;
+# roll the window forward daily with `manage.py refresh_calendar`
+SCHEDULE_CALENDAR_WEEKS = 12
 
 
 # Password validation
@@ -125,16 +227,44 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Custom User Model
 AUTH_USER_MODEL = 'users.CustomUser'
 
+# Password hashing. Argon2 is used when argon2-cffi is installed, otherwise
+# PBKDF2; hashes made by either keep verifying and are upgraded on login.
+# The Argon2 defaults are OWASP's minimum (19 MiB, 2 passes, 1 lane).
+ARGON2_TIME_COST = int(os.environ.get('ARGON2_TIME_COST', 2))
+ARGON2_MEMORY_COST = int(os.environ.get('ARGON2_MEMORY_COST', 19456))  # KiB
+ARGON2_PARALLELISM = int(os.environ.get('ARGON2_PARALLELISM', 1))
+PBKDF2_ITERATIONS = int(os.environ.get('PBKDF2_ITERATIONS', 600000))
+
+PASSWORD_HASHERS = [
+    'users.hashers.TunableArgon2PasswordHasher',
+    'users.hashers.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+if importlib.util.find_spec('argon2') is None:
+    PASSWORD_HASHERS.remove('users.hashers.TunableArgon2PasswordHasher')
+
 # REST Framework Settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # Used by the login throttles in users/throttles.py
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.environ.get('LOGIN_RATE_PER_IP', '30/min'),
+        'login_username': os.environ.get('LOGIN_RATE_PER_USERNAME', '10/min'),
+    },
 }
 
+# Pagination for the cursor-paginated list endpoints; clients may
+# request up to MAX_PAGE_SIZE rows with ?page_size=
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
 # JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -156,10 +286,57 @@ SIMPLE_JWT = {
 
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
+    'TOKEN_USER_CLASS': 'users.authentication.ClaimsUser',
 
     'JTI_CLAIM': 'jti',
 }
 
+# Logging: the project's loggers write JSON lines to stderr from a background
+# thread (see appointment_system/log.py); Django's own loggers keep their defaults
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'redact': {'()': 'appointment_system.log.RedactFilter'},
+    },
+    'formatters': {
+        'json': {'()': 'appointment_system.log.JsonFormatter'},
+    },
+    'handlers': {
+        'queue': {
+            'class': 'appointment_system.log.QueueLogHandler',
+            'stream': 'ext://sys.stderr',
+            'formatter': 'json',
+            'filters': ['redact'],
+        },
+    },
+    'loggers': {
+        app: {'handlers': ['queue'], 'level': LOG_LEVEL, 'propagate': False}
+        for app in ('appointment_system', 'appointments', 'doctors', 'users')
+    },
+}
+
+# Per-request timing (appointment_system.middleware.PerformanceMiddleware).
+# Every request is logged at DEBUG; requests slower than PERF_SLOW_REQUEST_MS
+# at WARNING with up to PERF_SQL_CAPTURE_LIMIT of their SQL statements. The
+# Server-Timing header shows clients query counts and timings, so it is on by
+# default only in DEBUG. PERF_DRF_TIMERS wraps DRF's serializer output and
+# authentication at startup to add the 'serialize' and 'auth' timings.
+PERF_SLOW_REQUEST_MS = float(os.environ.get('PERF_SLOW_REQUEST_MS', 500))
+PERF_SQL_CAPTURE_LIMIT = int(os.environ.get('PERF_SQL_CAPTURE_LIMIT', 100))
+PERF_SERVER_TIMING = os.environ.get('PERF_SERVER_TIMING', '1' if DEBUG else '0') == '1'
+PERF_DRF_TIMERS = os.environ.get('PERF_DRF_TIMERS', '1') == '1'
+
+# /metrics. Under a multi-process server point METRICS_DIR at a directory the
+# workers share and clear it on deploy; each worker writes its totals there at
+# most every METRICS_FLUSH_SECONDS. With METRICS_TOKEN set, scrapes must send
+# it as a bearer token.
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', 5))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -0,0 +1,45 @@
+"""
+SQLite backend with the two connection OPTIONS Django 5.1 adds to its own:
+
+- ``init_command``: ';'-separated statements run on every new connection,
+  used for PRAGMAs such as WAL journal mode.
+- ``transaction_mode``: 'DEFERRED', 'IMMEDIATE' or 'EXCLUSIVE' for the BEGIN
+  that opens atomic blocks.
+
+Once the project is on Django 5.1, ENGINE can go back to
+django.db.backends.sqlite3 with the same OPTIONS.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('init_command', None)
+        params.pop('transaction_mode', None)
+        return params
+
+    @property
+    def transaction_mode(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        if mode is not None and mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'settings.DATABASES transaction_mode must be one of {", ".join(TRANSACTION_MODES)}'
+            )
+        return mode and mode.upper()
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for command in self.settings_dict['OPTIONS'].get('init_command', '').split(';'):
+            if command.strip():
+                conn.execute(command)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
@@ -0,0 +1,162 @@
+import threading
+from datetime import time
+from unittest import skipUnless
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import serializers
+from rest_framework.test import APIClient
+from appointments.tests import create_doctor, next_monday
+from doctors.models import Specialization
+from users.models import CustomUser
+from users.tokens import UserRefreshToken
+from .metrics import REGISTRY, Counter, Histogram
+from .middleware import PINNED_COOKIE
+
+
+@skipUnless(
+    'replica1' in settings.DATABASES,
+    'needs a replica, e.g. DB_REPLICAS=replica.sqlite3 python manage.py test appointment_system'
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    """The replica is a test mirror of the primary, so each test checks which connection ran the queries."""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.doctor = create_doctor('doctor', Specialization.objects.create(name='Cardiology'))
+        patient = CustomUser.objects.create_user(username='patient', password='password123')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {UserRefreshToken.for_user(patient).access_token}')
+        self.day = next_monday()
+
+    def queries(self, method, path, data=None):
+        # Returns (response, replica query count, primary query count)
+        with CaptureQueriesContext(connections['replica1']) as replica, \
+                CaptureQueriesContext(connections['default']) as primary:
+            response = getattr(self.client, method)(path, data, format='json')
+        return response, len(replica), len(primary)
+
+    def slots_range(self):
+        return self.queries('get', f'/api/doctors/{self.doctor.id}/available-slots/range/?start={self.day}')
+
+    def book(self):
+        response, _, _ = self.queries('post', '/api/appointments/', {
+            'doctor': self.doctor.id, 'appointment_date': self.day, 'appointment_time': time(9).strftime('%H:%M'),
+        })
+        self.assertEqual(response.status_code, 201)
+        return response
+
+    def test_replica_views_read_from_the_replica(self):
+        response, replica, primary = self.slots_range()
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(replica, 0)
+        self.assertEqual(primary, 0)
+
+    def test_other_views_read_from_the_primary(self):
+        response, replica, primary = self.queries('get', '/api/appointments/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(replica, 0)
+        self.assertGreater(primary, 0)
+
+    def test_write_sets_the_pin_cookie(self):
+        response = self.book()
+        self.assertIn(PINNED_COOKIE, response.cookies)
+        self.assertEqual(response.cookies[PINNED_COOKIE]['max-age'], settings.REPLICA_STICKY_SECONDS)
+        _, replica, primary = self.slots_range()
+        self.assertEqual(replica, 0)
+        self.assertGreater(primary, 0)
+
+    def test_write_pins_the_token_without_the_cookie(self):
+        self.book()
+        self.client.cookies.clear()
+        _, replica, _ = self.slots_range()
+        self.assertEqual(replica, 0)
+        # The pin expires with its cache entry
+        cache.clear()
+        _, replica, _ = self.slots_range()
+        self.assertGreater(replica, 0)
+
+    def test_failed_write_does_not_pin(self):
+        response, _, _ = self.queries('post', '/api/appointments/', {'doctor': self.doctor.id})
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn(PINNED_COOKIE, response.cookies)
+        _, replica, _ = self.slots_range()
+        self.assertGreater(replica, 0)
+
+
+class MetricShardTests(SimpleTestCase):
+    def setUp(self):
+        self.counter = Counter('test_counter_total', 'Test counter', ['result'])
+        self.histogram = Histogram('test_duration_seconds', 'Test histogram', buckets=(0.1, 1.0))
+        self.addCleanup(REGISTRY.pop, self.counter.name)
+        self.addCleanup(REGISTRY.pop, self.histogram.name)
+
+    def record(self):
+        self.counter.inc(result='ok')
+        self.histogram.observe(0.5)
+
+    def run_threads(self, count):
+        threads = [threading.Thread(target=self.record) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_finished_threads_are_folded_into_the_totals(self):
+        self.record()
+        self.run_threads(20)
+        self.assertEqual(self.counter.collect(), {('ok',): 21})
+        self.assertEqual(self.histogram.collect(), {(): [0, 21, 0, 10.5, 21]})
+        # Only this thread still has a shard of its own
+        self.assertEqual(len(self.counter._shards), 1)
+        self.assertEqual(len(self.histogram._shards), 1)
+
+    def test_new_threads_retire_finished_ones_without_a_scrape(self):
+        self.run_threads(20)
+        self.record()
+        self.assertEqual(len(self.counter._shards), 1)
+        self.assertEqual(self.counter.collect(), {('ok',): 21})
+
+
+class PerformanceMiddlewareTests(TestCase):
+    logger = 'appointment_system.performance'
+
+    def setUp(self):
+        cache.clear()
+        create_doctor('doctor', Specialization.objects.create(name='Cardiology'))
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(username='patient', password='password123'))
+
+    def test_drf_timers_are_installed_at_startup(self):
+        self.assertEqual(serializers.Serializer.data.fget.timer_name, 'serialize')
+
+    @override_settings(PERF_SERVER_TIMING=True)
+    def test_server_timing(self):
+        response = self.client.get('/api/doctors/')
+        entries = [entry.split(';')[0] for entry in response['Server-Timing'].split(', ')]
+        self.assertEqual(entries[:2], ['total', 'db'])
+        self.assertIn('serialize', entries)
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+    @override_settings(PERF_SERVER_TIMING=False)
+    def test_server_timing_off(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/doctors/'))
+
+    def test_requests_are_logged_at_debug(self):
+        with self.assertLogs(self.logger, 'DEBUG') as logs:
+            self.client.get('/api/doctors/')
+        [record] = logs.records
+        self.assertEqual(record.levelname, 'DEBUG')
+        self.assertFalse(hasattr(record, 'sql'))
+
+    @override_settings(PERF_SLOW_REQUEST_MS=0)
+    def test_slow_request_logs_its_sql(self):
+        with self.assertLogs(self.logger, 'WARNING') as logs:
+            self.client.get('/api/doctors/')
+        [record] = logs.records
+        self.assertGreater(record.queries, 0)
+        self.assertEqual(len(record.sql), record.queries)
+        self.assertIn('doctors_doctor', record.sql[0]['sql'])
@@ -0,0 +1,76 @@
+"""
+Async variants of the slot lookup endpoints, served under /api/async/.
+
+Plain Django async views returning JsonResponse; the JWT is checked with
+users.authentication.aauthenticate since DRF's authentication is sync-only.
+"""
+import asyncio
+from datetime import date
+from django.http import HttpResponseNotAllowed, JsonResponse
+from appointment_system.routers import use_replica
+from users.authentication import aauthenticate
+from .slots import afree_slots, format_slot
+
+# Most doctors one multi-doctor lookup will fan out to
+MAX_ASYNC_DOCTORS = 50
+
+
+async def _check_request(request):
+    # Returns an error response, or None when the request may proceed
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    if await aauthenticate(request) is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    return None
+
+
+def _requested_date(request):
+    try:
+        return date.fromisoformat(request.GET.get('date', date.today().isoformat()))
+    except ValueError:
+        return None
+
+
+@use_replica
+async def available_slots(request, doctor_id):
+    error = await _check_request(request)
+    if error:
+        return error
+
+    requested_date = _requested_date(request)
+    if requested_date is None:
+        return JsonResponse({'error': 'Invalid date format'}, status=400)
+
+    slots = await afree_slots(doctor_id, requested_date)
+    if slots is None:
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+    return JsonResponse({'available_slots': [format_slot(minute) for minute in slots]})
+
+
+@use_replica
+async def available_slots_many(request):
+    """Free slots of several doctors on one date: ``?doctors=1,2,3&date=YYYY-MM-DD``."""
+    error = await _check_request(request)
+    if error:
+        return error
+
+    requested_date = _requested_date(request)
+    if requested_date is None:
+        return JsonResponse({'error': 'Invalid date format'}, status=400)
+    try:
+        doctor_ids = list(dict.fromkeys(int(value) for value in request.GET.get('doctors', '').split(',') if value))
+    except ValueError:
+        return JsonResponse({'error': 'doctors must be a comma-separated list of ids'}, status=400)
+    if not doctor_ids:
+        return JsonResponse({'error': 'doctors is required'}, status=400)
+    if len(doctor_ids) > MAX_ASYNC_DOCTORS:
+        return JsonResponse({'error': f'Cannot look up more than {MAX_ASYNC_DOCTORS} doctors at once'}, status=400)
+
+    results = await asyncio.gather(*(afree_slots(doctor_id, requested_date) for doctor_id in doctor_ids))
+    return JsonResponse({
+        'available_slots': {
+            str(doctor_id): [format_slot(minute) for minute in slots]
+            for doctor_id, slots in zip(doctor_ids, results)
+            if slots is not None
+        }
+    })
@@ -0,0 +1,135 @@
+"""
+Load-test the async read endpoints under /api/async/ against their sync DRF
+counterparts.
+
+Requests go through Django's in-process clients: AsyncClient drives the ASGI
+handler with --concurrency tasks in flight, and Client drives the WSGI handler
+with --concurrency threads. Both run against the same file-backed scratch
+SQLite database. Pass --cold to bypass the caches so every request reaches
+the database.
+"""
+import asyncio
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from appointment_system.benchmarks import scratch_database, seed, summarize, next_weekday
+
+DUMMY_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+# Doctors per multi-doctor slot lookup
+FAN_OUT = 10
+
+
+class Command(BaseCommand):
+    help = 'Compare latency and throughput of the async read endpoints with the sync ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=200)
+        parser.add_argument('--appointments', type=int, default=20000)
+        parser.add_argument('--requests', type=int, default=400, help='Requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--cold', action='store_true', help='Disable the caches')
+
+    def handle(self, *args, **options):
+        path = os.path.join(tempfile.mkdtemp(), 'bench_async_reads.sqlite3')
+        caches = {'CACHES': DUMMY_CACHES} if options['cold'] else {}
+        with scratch_database(path), override_settings(ALLOWED_HOSTS=['testserver'], **caches):
+            doctors, patients = seed(options['doctors'], 100, options['appointments'])
+            token = str(RefreshToken.for_user(patients[0]).access_token)
+            self.headers = {'Authorization': f'Bearer {token}'}
+            rng = random.Random(0)
+            doctor_ids = [doctor.id for doctor in doctors]
+            first_day = next_weekday()
+
+            def slot_path(prefix):
+                day = first_day + timedelta(days=rng.randrange(28))
+                return f'/api/{prefix}doctors/{rng.choice(doctor_ids)}/available-slots/?date={day}'
+
+            def many_paths(prefix):
+                day = first_day + timedelta(days=rng.randrange(28))
+                chosen = rng.sample(doctor_ids, FAN_OUT)
+                if prefix:
+                    return [f'/api/async/doctors/available-slots/?date={day}&doctors={",".join(map(str, chosen))}']
+                return [f'/api/doctors/{doctor_id}/available-slots/?date={day}' for doctor_id in chosen]
+
+            endpoints = [
+                ('doctor list', lambda prefix: [f'/api/{prefix}doctors/?page_size=50']),
+                ('specializations', lambda prefix: [f'/api/{prefix}specializations/']),
+                ('slots', lambda prefix: [slot_path(prefix)]),
+                (f'slots x{FAN_OUT} doctors', many_paths),
+            ]
+
+            self.stdout.write(f'{options["requests"]} requests per endpoint, concurrency {options["concurrency"]}'
+                              f'{", caches disabled" if options["cold"] else ""}')
+            for label, paths in endpoints:
+                sync_work = [paths('') for _ in range(options['requests'])]
+                async_work = [paths('async/') for _ in range(options['requests'])]
+                for mode, runner, work in (('sync', self.run_sync, sync_work), ('async', self.run_async, async_work)):
+                    started = time.perf_counter()
+                    latencies, failures = runner(work, options['concurrency'])
+                    elapsed = time.perf_counter() - started
+                    stats = summarize(latencies)
+                    self.stdout.write(
+                        f'  {label:<20} {mode:<5} {len(work) / elapsed:8.1f} req/s  '
+                        f'p50 {stats["p50"]:7.2f}  p95 {stats["p95"]:7.2f}  p99 {stats["p99"]:7.2f} ms'
+                        f'{f"  ({failures} failed)" if failures else ""}'
+                    )
+
+    def run_sync(self, work, concurrency):
+        latencies, failures = [], []
+        pending = iter(work)
+        lock = threading.Lock()
+
+        def worker():
+            client = Client()
+            try:
+                while True:
+                    with lock:
+                        paths = next(pending, None)
+                    if paths is None:
+                        return
+                    started = time.perf_counter()
+                    ok = all(client.get(path, headers=self.headers).status_code == 200 for path in paths)
+                    elapsed = (time.perf_counter() - started) * 1000
+                    with lock:
+                        latencies.append(elapsed)
+                        if not ok:
+                            failures.append(paths)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, len(failures)
+
+    def run_async(self, work, concurrency):
+        latencies, failures = [], []
+
+        async def main():
+            client = AsyncClient()
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def fetch(paths):
+                async with semaphore:
+                    started = time.perf_counter()
+                    responses = [await client.get(path, headers=self.headers) for path in paths]
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    if any(response.status_code != 200 for response in responses):
+                        failures.append(paths)
+
+            await asyncio.gather(*(fetch(paths) for paths in work))
+
+        async_to_sync(main)()
+        return latencies, len(failures)
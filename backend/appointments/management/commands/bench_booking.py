@@ -0,0 +1,105 @@
+"""
+Hammer a handful of slots with concurrent bookings and check that no slot
+ends up double booked.
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from appointments.models import Appointment
+from appointments.slots import ACTIVE_STATUSES, free_slots, format_slot
+from appointment_system.benchmarks import scratch_database, seed, summarize, api_client
+from doctors.models import Doctor
+
+
+def run_booking_load(threads, requests, doctors):
+    """Seed the current (scratch) database and book from ``threads`` threads at once.
+
+    Returns (response status counts, latencies in ms, elapsed seconds, double-booked slot count).
+    Conflicts caused by lock contention rather than a taken slot are counted as '409 busy'.
+    """
+    doctor_rows, patients = seed(doctors, threads, appointments=0)
+    # Seeded doctors keep different days and hours, so take the first 16 slots of
+    # each one's next working day. Every thread cycles through the same slots, so
+    # most attempts contend
+    slots = []
+    for doctor in Doctor.objects.select_related('specialization').filter(id__in=[row.id for row in doctor_rows]):
+        day = date.today() + timedelta(days=1)
+        while not (minutes := free_slots(doctor, day)):
+            day += timedelta(days=1)
+        slots += [(doctor.id, day, format_slot(minute)) for minute in minutes[:16]]
+
+    statuses = Counter()
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(patient, offset):
+        client = api_client(patient)
+        try:
+            for i in range(requests):
+                doctor_id, day, slot = slots[(offset + i) % len(slots)]
+                started = time.perf_counter()
+                response = client.post('/api/appointments/', {
+                    'doctor': doctor_id, 'appointment_date': day, 'appointment_time': slot
+                })
+                elapsed = (time.perf_counter() - started) * 1000
+                code = str(response.status_code)
+                if response.status_code == 409 and 'busy' in str(response.data):
+                    code += ' busy'
+                with lock:
+                    statuses[code] += 1
+                    latencies.append(elapsed)
+                # Free a slot now and then so it is contended again
+                if response.status_code == 201 and i % 3 == 0:
+                    client.post(f'/api/appointments/{response.data["id"]}/cancel/')
+        finally:
+            connection.close()
+
+    workers = [
+        threading.Thread(target=worker, args=(patient, n * 7))
+        for n, patient in enumerate(patients[:threads])
+    ]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    double_booked = Appointment.objects.filter(status__in=ACTIVE_STATUSES).values(
+        'doctor_id', 'appointment_date', 'appointment_time'
+    ).annotate(n=Count('id')).filter(n__gt=1).count()
+    return statuses, latencies, elapsed, double_booked
+
+
+class Command(BaseCommand):
+    help = 'Concurrent booking load test: reports throughput and verifies there are no double bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=50, help='Booking attempts per thread')
+        parser.add_argument('--doctors', type=int, default=2)
+
+    def handle(self, *args, **options):
+        # 409s are expected here; keep django.request from logging each one
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        path = os.path.join(tempfile.mkdtemp(), 'bench_booking.sqlite3')
+        with scratch_database(path):
+            statuses, latencies, elapsed, double_booked = run_booking_load(
+                options['threads'], options['requests'], options['doctors']
+            )
+
+        total = sum(statuses.values())
+        stats = summarize(latencies)
+        self.stdout.write(f'{total} booking attempts in {elapsed:.2f}s ({total / elapsed:.1f} req/s)')
+        self.stdout.write('Responses: ' + ', '.join(f'{code}: {n}' for code, n in sorted(statuses.items())))
+        self.stdout.write(f'Latency ms: p50 {stats["p50"]:.1f}, p95 {stats["p95"]:.1f}, p99 {stats["p99"]:.1f}')
+        self.stdout.write(f'Double-booked slots: {double_booked}')
+        if double_booked or set(statuses) - {'201', '409', '409 busy'}:
+            raise CommandError('Booking path produced double bookings or unexpected responses')
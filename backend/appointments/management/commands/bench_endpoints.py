@@ -0,0 +1,347 @@
+"""
+Load-test the main API endpoints and record throughput, latency percentiles
+and queries per request, optionally flagging regressions against a baseline.
+
+By default it seeds a scratch database (``--scale`` as in ``manage.py seed``)
+and drives the views through the Django test client, which also counts the
+queries behind each request. With ``--url`` it drives a running server over
+HTTP instead; seed that server's database with ``manage.py seed`` first, and
+raise LOGIN_RATE_PER_IP / LOGIN_RATE_PER_USERNAME there or the login
+scenario measures the throttle. Queries per request are then read from the
+Server-Timing header, when the server sends it (PERF_SERVER_TIMING).
+
+Results go to ``--output`` as JSON. ``--baseline`` compares them with an
+earlier results file and fails when an endpoint's p95 latency or throughput
+regressed by more than ``--threshold``, or it started issuing more queries.
+"""
+import json
+import logging
+import os
+import platform
+import random
+import re
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from datetime import date, datetime, timedelta
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from appointment_system.benchmarks import api_client, scratch_database, summarize
+from appointment_system.seeding import generate
+from users.models import CustomUser
+from users.tokens import UserRefreshToken
+from users.views import UserLoginView
+
+PASSWORD = 'password123'
+
+ENDPOINTS = ['login', 'doctor_list', 'available_slots', 'book', 'cancel', 'admin_doctors', 'admin_appointments']
+
+# Query strings the doctor list scenario rotates through
+DOCTOR_LIST_QUERIES = ['', '?ordering=fee', '?ordering=-experience', '?specialization=1', '?q=smith']
+
+# Query count in PerformanceMiddleware's Server-Timing header
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+BOOKING_TIMES = [f'{9 + i // 2:02d}:{30 * (i % 2):02d}' for i in range(16)]
+
+
+class TestClientTransport:
+    """Requests through the in-process test client; counts each request's queries."""
+
+    def __init__(self):
+        self.client = api_client()
+
+    def request(self, method, path, token=None, data=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method.lower())(path, data, format='json', headers=headers)
+        body = response.data if hasattr(response, 'data') else None
+        return response.status_code, body, len(queries)
+
+    def close(self):
+        connection.close()
+
+
+class HttpTransport:
+    """Requests to a running server over HTTP; query counts come from Server-Timing."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, token=None, data=None):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        body = json.dumps(data).encode() if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                status, headers, payload = response.status, response.headers, response.read()
+        except urllib.error.HTTPError as e:
+            status, headers, payload = e.code, e.headers, e.read()
+        match = SERVER_TIMING_QUERIES.search(headers.get('Server-Timing', ''))
+        queries = int(match.group(1)) if match else None
+        try:
+            return status, json.loads(payload) if payload else None, queries
+        except ValueError:
+            return status, None, queries
+
+    def close(self):
+        pass
+
+
+class Scenarios:
+    """One method per endpoint; each makes a single request and returns (status, body, queries)."""
+
+    def __init__(self, doctor_ids, patients, admin_token):
+        # patients: (username, access token) pairs
+        self.doctor_ids = doctor_ids
+        self.patients = patients
+        self.admin_token = admin_token
+        self.booked = []
+        self.booked_lock = threading.Lock()
+        today = date.today()
+        self.days = [
+            (today + timedelta(days=offset)).isoformat() for offset in range(1, 15)
+            if (today + timedelta(days=offset)).weekday() < 5
+        ]
+
+    def login(self, transport, rng):
+        username, _ = rng.choice(self.patients)
+        return transport.request('POST', '/api/auth/login/', data={'username': username, 'password': PASSWORD})
+
+    def doctor_list(self, transport, rng):
+        return transport.request('GET', '/api/doctors/' + rng.choice(DOCTOR_LIST_QUERIES))
+
+    def available_slots(self, transport, rng):
+        _, token = rng.choice(self.patients)
+        doctor_id = rng.choice(self.doctor_ids)
+        return transport.request('GET', f'/api/doctors/{doctor_id}/available-slots/?date={rng.choice(self.days)}', token)
+
+    def book(self, transport, rng):
+        _, token = rng.choice(self.patients)
+        status, body, queries = transport.request('POST', '/api/appointments/', token, {
+            'doctor': rng.choice(self.doctor_ids),
+            'appointment_date': rng.choice(self.days),
+            'appointment_time': rng.choice(BOOKING_TIMES),
+        })
+        if status == 201:
+            with self.booked_lock:
+                self.booked.append((body['id'], token))
+        return status, body, queries
+
+    def cancel(self, transport, rng):
+        # Cancels what the book scenario created
+        with self.booked_lock:
+            if not self.booked:
+                return None
+            appointment_id, token = self.booked.pop()
+        return transport.request('POST', f'/api/appointments/{appointment_id}/cancel/', token)
+
+    def admin_doctors(self, transport, rng):
+        return transport.request('GET', '/api/admin/doctors/list/', self.admin_token)
+
+    def admin_appointments(self, transport, rng):
+        return transport.request('GET', '/api/appointments/', self.admin_token)
+
+
+def run_endpoint(scenario, make_transport, requests, concurrency, rng_seed):
+    """Issue ``requests`` calls of ``scenario`` from ``concurrency`` threads and summarize them."""
+    latencies, query_counts = [], []
+    statuses = Counter()
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def worker(index):
+        rng = random.Random(rng_seed * 1000 + index)
+        transport = make_transport()
+        try:
+            while True:
+                with lock:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                started = time.perf_counter()
+                result = scenario(transport, rng)
+                elapsed = (time.perf_counter() - started) * 1000
+                if result is None:
+                    return
+                status, _, queries = result
+                with lock:
+                    latencies.append(elapsed)
+                    statuses[str(status)] += 1
+                    if queries is not None:
+                        query_counts.append(queries)
+        finally:
+            transport.close()
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    stats = summarize(latencies)
+    return {
+        'requests': stats['count'],
+        'throughput': stats['count'] / elapsed if elapsed else 0.0,
+        'p50': stats['p50'],
+        'p95': stats['p95'],
+        'p99': stats['p99'],
+        'mean': stats['mean'],
+        'max': stats['max'],
+        'queries': sum(query_counts) / len(query_counts) if query_counts else None,
+        'statuses': dict(sorted(statuses.items())),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Regression messages for endpoints present in both result sets."""
+    regressions = []
+    for name, current in results['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if not previous or not current['requests'] or not previous['requests']:
+            continue
+        if current['p95'] > previous['p95'] * (1 + threshold):
+            regressions.append(f'{name}: p95 {previous["p95"]:.1f} -> {current["p95"]:.1f} ms')
+        if current['throughput'] < previous['throughput'] * (1 - threshold):
+            regressions.append(f'{name}: throughput {previous["throughput"]:.1f} -> {current["throughput"]:.1f} req/s')
+        if current['queries'] is not None and previous['queries'] is not None and current['queries'] > previous['queries'] + 0.5:
+            regressions.append(f'{name}: queries/request {previous["queries"]:.1f} -> {current["queries"]:.1f}')
+    return regressions
+
+
+class Command(BaseCommand):
+    help = 'Load-test the API endpoints and report throughput, latency percentiles and queries per request'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Base URL of a running server, e.g. http://127.0.0.1:8000; default is the test client')
+        parser.add_argument('--scale', type=int, default=5, help='Seed scale for the scratch database (test client only)')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=400, help='Requests per endpoint')
+        parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help='Comma-separated subset of: ' + ', '.join(ENDPOINTS))
+        parser.add_argument('--users', type=int, default=20, help='Patient accounts to log in as')
+        parser.add_argument('--admin-username', help='Admin account for the admin scenarios with --url')
+        parser.add_argument('--admin-password', default=PASSWORD)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default='bench_endpoints.json')
+        parser.add_argument('--baseline', help='Earlier results file to compare against')
+        parser.add_argument('--threshold', type=float, default=0.2, help='Allowed relative regression, default 20%%')
+
+    def handle(self, *args, **options):
+        endpoints = [name.strip() for name in options['endpoints'].split(',') if name.strip()]
+        unknown = set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f'Unknown endpoints: {", ".join(sorted(unknown))}')
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        # 4xx responses (conflicts, throttling) are part of the load; don't log each one
+        logging.disable(logging.WARNING)
+        try:
+            if options['url']:
+                results = self.run_http(endpoints, options)
+            else:
+                path = os.path.join(tempfile.mkdtemp(), 'bench_endpoints.sqlite3')
+                with scratch_database(path):
+                    results = self.run_test_client(endpoints, options)
+        finally:
+            logging.disable(logging.NOTSET)
+
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2)
+        self.report(results)
+        self.stdout.write(f'\nResults written to {options["output"]}')
+
+        if baseline is not None:
+            regressions = compare(results, baseline, options['threshold'])
+            if regressions:
+                for message in regressions:
+                    self.stdout.write(self.style.ERROR(f'REGRESSION {message}'))
+                raise CommandError(f'{len(regressions)} regression(s) against {options["baseline"]}')
+            self.stdout.write(self.style.SUCCESS(f'No regressions against {options["baseline"]}'))
+
+    def run_test_client(self, endpoints, options):
+        self.stdout.write(f'Seeding scale {options["scale"]}...')
+        doctors, patients = generate(
+            10 * options['scale'], 500 * options['scale'], 10000 * options['scale'],
+            rng_seed=options['seed'], password=make_password(PASSWORD),
+        )
+        admin = CustomUser.objects.create_user(username='bench-admin', password=PASSWORD, user_type='admin')
+        scenarios = Scenarios(
+            [doctor.id for doctor in doctors],
+            [(patient.username, str(UserRefreshToken.for_user(patient).access_token)) for patient in patients[:options['users']]],
+            str(UserRefreshToken.for_user(admin).access_token),
+        )
+        # Login throughput here is the password check, not the throttle
+        throttles, UserLoginView.throttle_classes = UserLoginView.throttle_classes, []
+        try:
+            return self.run(endpoints, scenarios, TestClientTransport, 'test client', options)
+        finally:
+            UserLoginView.throttle_classes = throttles
+
+    def run_http(self, endpoints, options):
+        transport = HttpTransport(options['url'])
+
+        def token(username, password):
+            status, body, _ = transport.request('POST', '/api/auth/login/', data={'username': username, 'password': password})
+            if status != 200:
+                raise CommandError(f'Could not log in as {username}: HTTP {status}')
+            return body['access']
+
+        status, body, _ = transport.request('GET', '/api/doctors/?page_size=100')
+        if status != 200 or not body['results']:
+            raise CommandError('The server has no doctors; seed its database with manage.py seed')
+        patients = [(f'patient{i}', token(f'patient{i}', PASSWORD)) for i in range(options['users'])]
+        admin_token = None
+        if options['admin_username']:
+            admin_token = token(options['admin_username'], options['admin_password'])
+        else:
+            endpoints = [name for name in endpoints if not name.startswith('admin_')]
+            self.stdout.write('No --admin-username; skipping the admin scenarios')
+        scenarios = Scenarios([doctor['id'] for doctor in body['results']], patients, admin_token)
+        return self.run(endpoints, scenarios, lambda: HttpTransport(options['url']), options['url'], options)
+
+    def run(self, endpoints, scenarios, make_transport, target, options):
+        results = {
+            'meta': {
+                'target': target,
+                'scale': None if options['url'] else options['scale'],
+                'concurrency': options['concurrency'],
+                'requests': options['requests'],
+                'seed': options['seed'],
+                'started': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+            },
+            'endpoints': {},
+        }
+        # book runs before cancel so there is something to cancel
+        for name in sorted(endpoints, key=ENDPOINTS.index):
+            self.stdout.write(f'  {name}...')
+            results['endpoints'][name] = run_endpoint(
+                getattr(scenarios, name), make_transport, options['requests'], options['concurrency'], options['seed']
+            )
+        return results
+
+    def report(self, results):
+        meta = results['meta']
+        self.stdout.write(f'\n{meta["target"]}, concurrency {meta["concurrency"]}, {meta["requests"]} requests per endpoint')
+        self.stdout.write(f'{"endpoint":<20} {"req/s":>8} {"p50":>8} {"p95":>8} {"p99":>8} {"queries":>8}  statuses')
+        for name, stats in results['endpoints'].items():
+            queries = f'{stats["queries"]:8.1f}' if stats['queries'] is not None else f'{"-":>8}'
+            statuses = ', '.join(f'{code}: {n}' for code, n in stats['statuses'].items())
+            self.stdout.write(
+                f'{name:<20} {stats["throughput"]:8.1f} {stats["p50"]:8.1f} {stats["p95"]:8.1f} {stats["p99"]:8.1f} {queries}  {statuses}'
+            )
@@ -0,0 +1,80 @@
+"""
+Seed a scratch database and compare query plans and timings for the booking
+hot paths with and without the composite indexes. The partial unique
+constraint on active bookings is an index too (it serves the booked-slot
+lookup), so it is dropped along with them.
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection
+from appointments.models import Appointment
+from appointments.slots import ACTIVE_STATUSES
+from doctors.models import Doctor
+from appointment_system.benchmarks import scratch_database, measure, seed
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the booking hot-path queries with and without the composite indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=500)
+        parser.add_argument('--patients', type=int, default=5000)
+        parser.add_argument('--appointments', type=int, default=200000)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.stdout.write('Seeding...')
+            doctors, patients = seed(options['doctors'], options['patients'], options['appointments'])
+            doctor, patient = doctors[len(doctors) // 2], patients[len(patients) // 2]
+            day = Appointment.objects.filter(doctor=doctor).values_list('appointment_date', flat=True).first()
+
+            queries = {
+                'booked slots': lambda: Appointment.objects.filter(
+                    doctor_id=doctor.id, appointment_date=day, status__in=ACTIVE_STATUSES
+                ).order_by().values_list('appointment_time', flat=True),
+                'doctor appointments': lambda: Appointment.objects.filter(
+                    doctor_id=doctor.id
+                ).order_by('appointment_date', 'appointment_time', 'id')[:20],
+                'patient appointments': lambda: Appointment.objects.filter(
+                    patient_id=patient.id
+                ).order_by('appointment_date', 'appointment_time', 'id')[:20],
+                'doctors by specialization': lambda: Doctor.objects.filter(
+                    specialization_id=doctor.specialization_id, is_available=True
+                ),
+            }
+
+            self.toggle_indexes(add=False)
+            before = self.run(queries, options['repeat'], 'Without indexes')
+            self.toggle_indexes(add=True)
+            after = self.run(queries, options['repeat'], 'With indexes')
+
+            self.stdout.write('\nSummary (p50 ms)')
+            for label in queries:
+                self.stdout.write(f'  {label:<28} {before[label]["p50"]:8.3f} -> {after[label]["p50"]:8.3f}')
+
+    def toggle_indexes(self, add):
+        with connection.schema_editor() as editor:
+            for model in (Appointment, Doctor):
+                for index in model._meta.indexes:
+                    if add:
+                        editor.add_index(model, index)
+                    else:
+                        editor.remove_index(model, index)
+                for constraint in model._meta.constraints:
+                    if add:
+                        editor.add_constraint(model, constraint)
+                    else:
+                        editor.remove_constraint(model, constraint)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def run(self, queries, repeat, title):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n{title}'))
+        results = {}
+        for label, build in queries.items():
+            plan = build().explain()
+            results[label] = measure(lambda: list(build()), repeat)
+            self.stdout.write(f'{label}: p50 {results[label]["p50"]:.3f} ms, p99 {results[label]["p99"]:.3f} ms')
+            for line in plan.splitlines():
+                self.stdout.write(f'    {line}')
+        return results
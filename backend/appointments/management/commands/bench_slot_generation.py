@@ -0,0 +1,87 @@
+"""
+Compare integer-minute slot generation (slots.slot_table) with the original
+per-slot datetime.combine loop on synthetic schedules.
+
+Runs entirely in memory: only slot generation is timed, not the queries that
+load schedules and bookings.
+"""
+import random
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+from django.core.management.base import BaseCommand
+from appointments.slots import slot_table, to_minutes
+
+DURATIONS = [15, 20, 30, 45, 60]
+BUFFERS = [0, 0, 5, 10]
+
+
+def legacy_slots(intervals, duration, buffer):
+    # The loop available_slots used before slot generation moved to integer minutes
+    slot_duration = timedelta(minutes=duration)
+    step = timedelta(minutes=duration + buffer)
+    slots = []
+    for start_time, end_time in intervals:
+        current_time = start_time
+        while datetime.combine(date.min, current_time) + slot_duration <= datetime.combine(date.min, end_time):
+            slots.append(current_time)
+            current_time = (datetime.combine(date.min, current_time) + step).time()
+            if current_time < start_time:
+                break
+    return sorted(set(slots))
+
+
+class Command(BaseCommand):
+    help = 'Benchmark slot generation for many doctors and days'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=1000)
+        parser.add_argument('--days', type=int, default=30)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        first_day = date.today()
+        lengths = {
+            doctor_id: (rng.choice(DURATIONS), rng.choice(BUFFERS))
+            for doctor_id in range(options['doctors'])
+        }
+        intervals = {}
+        for doctor_id in lengths:
+            split_shift = rng.random() < 0.3
+            for offset in range(options['days']):
+                day = first_day + timedelta(days=offset)
+                if day.weekday() >= 5:
+                    continue
+                if split_shift:
+                    intervals[doctor_id, day] = [(dt_time(8), dt_time(12)), (dt_time(13), dt_time(18))]
+                else:
+                    intervals[doctor_id, day] = [(dt_time(9), dt_time(17))]
+
+        def run_legacy():
+            return {
+                key: [to_minutes(slot) for slot in legacy_slots(rows, *lengths[key[0]])]
+                for key, rows in intervals.items()
+            }
+
+        def run_table():
+            return slot_table(intervals, lengths)
+
+        if run_legacy() != run_table():
+            self.stderr.write(self.style.ERROR('Slot generators disagree'))
+            return
+
+        slots = sum(len(minutes) for minutes in run_table().values())
+        self.stdout.write(f'{options["doctors"]} doctors x {options["days"]} days: {len(intervals)} working days, {slots} slots')
+
+        results = {}
+        for label, fn in (('datetime loop', run_legacy), ('integer ranges', run_table)):
+            best = float('inf')
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                fn()
+                best = min(best, time.perf_counter() - started)
+            results[label] = best * 1000
+            self.stdout.write(f'  {label:<16} {results[label]:10.1f} ms (best of {options["repeat"]})')
+
+        self.stdout.write(f'  speedup          {results["datetime loop"] / results["integer ranges"]:10.1f}x')
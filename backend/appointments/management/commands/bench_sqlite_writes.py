@@ -0,0 +1,59 @@
+"""
+Run the concurrent booking load twice on SQLite: once with Django's default
+connection settings and once with the tuned settings from settings.py (WAL,
+busy timeout, BEGIN IMMEDIATE, persistent connections).
+"""
+import copy
+import logging
+import os
+import tempfile
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from appointment_system.benchmarks import scratch_database, summarize
+from .bench_booking import run_booking_load
+
+
+class Command(BaseCommand):
+    help = 'Compare booking throughput on SQLite with default and tuned connection settings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=50, help='Booking attempts per thread')
+        parser.add_argument('--doctors', type=int, default=2)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('bench_sqlite_writes needs DB_ENGINE=sqlite')
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+
+        # Every thread's connection is built from this shared settings dict
+        settings_dict = connection.settings_dict
+        tuned = {key: copy.deepcopy(settings_dict[key]) for key in ('OPTIONS', 'CONN_MAX_AGE')}
+        # The scratch files are throwaway, so WAL is on even when the settings leave it off
+        tuned['OPTIONS']['init_command'] = ';'.join(settings.SQLITE_WAL_PRAGMAS + settings.SQLITE_PRAGMAS)
+        configs = [
+            ('default', {'OPTIONS': {}, 'CONN_MAX_AGE': 0}),
+            ('tuned', tuned),
+        ]
+
+        try:
+            for label, config in configs:
+                connection.close()
+                settings_dict.update(config)
+                # A fresh file per run: journal_mode=WAL persists in the database file
+                path = os.path.join(tempfile.mkdtemp(), f'bench_sqlite_{label}.sqlite3')
+                with scratch_database(path):
+                    statuses, latencies, elapsed, double_booked = run_booking_load(
+                        options['threads'], options['requests'], options['doctors']
+                    )
+                total = sum(statuses.values())
+                stats = summarize(latencies)
+                self.stdout.write(
+                    f'{label:<8} {total / elapsed:7.1f} req/s  p50 {stats["p50"]:6.1f}  p99 {stats["p99"]:7.1f} ms  '
+                    + ', '.join(f'{code}: {n}' for code, n in sorted(statuses.items()))
+                    + f'  double-booked: {double_booked}'
+                )
+        finally:
+            connection.close()
+            settings_dict.update(tuned)
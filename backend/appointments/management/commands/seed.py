@@ -0,0 +1,64 @@
+"""
+Populate an empty database with a reproducible synthetic dataset.
+
+Each unit of --scale adds 10 doctors, 500 patients and 10,000 appointments, so
+--scale 100 gives a million appointments. Every account shares --password,
+hashed once up front.
+"""
+import time
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from appointment_system.seeding import generate
+from doctors.calendar import refresh_calendar
+from doctors.models import Doctor
+
+DOCTORS_PER_SCALE = 10
+PATIENTS_PER_SCALE = 500
+APPOINTMENTS_PER_SCALE = 10000
+
+
+class Command(BaseCommand):
+    help = 'Bulk-create synthetic doctors, patients and appointment history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data')
+        parser.add_argument('--doctors', type=int, help='Override the doctor count from --scale')
+        parser.add_argument('--patients', type=int, help='Override the patient count from --scale')
+        parser.add_argument('--appointments', type=int, help='Override the appointment count from --scale')
+        parser.add_argument('--past-days', type=int, default=180, help='Days of appointment history before today')
+        parser.add_argument('--future-days', type=int, default=30, help='Days of bookings from today on')
+        parser.add_argument('--password', default='password123')
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        if Doctor.objects.exists():
+            raise CommandError('The database already has doctors; seed into an empty database')
+
+        scale = options['scale']
+        counts = {
+            'doctors': DOCTORS_PER_SCALE * scale,
+            'patients': PATIENTS_PER_SCALE * scale,
+            'appointments': APPOINTMENTS_PER_SCALE * scale,
+        }
+        counts.update({name: options[name] for name in counts if options[name] is not None})
+
+        started = time.perf_counter()
+
+        def log(message):
+            self.stdout.write(f'{time.perf_counter() - started:7.1f}s  {message}')
+
+        doctors, patients = generate(
+            counts['doctors'], counts['patients'], counts['appointments'],
+            past_days=options['past_days'], future_days=options['future_days'],
+            rng_seed=options['seed'], password=make_password(options['password']),
+            batch_size=options['batch_size'], log=log,
+        )
+
+        doctor_ids = [doctor.id for doctor in doctors]
+        for offset in range(0, len(doctor_ids), 200):
+            refresh_calendar(doctor_ids[offset:offset + 200])
+        log('calendars')
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(doctors)} doctors and {len(patients)} patients (password "{options["password"]}")'
+        ))
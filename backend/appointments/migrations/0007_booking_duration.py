@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:44
+
+from django.db import migrations, models
+
+
+def fill_durations(apps, schema_editor):
+    # Existing bookings take their doctor's current slot length plus buffer
+    Appointment = apps.get_model('appointments', 'Appointment')
+    Doctor = apps.get_model('doctors', 'Doctor')
+    alias = schema_editor.connection.alias
+    doctors = Doctor.objects.using(alias).select_related('specialization')
+    for doctor in doctors:
+        minutes = (doctor.slot_minutes or doctor.specialization.slot_minutes) + doctor.buffer_minutes
+        Appointment.objects.using(alias).filter(doctor_id=doctor.id).exclude(
+            duration_minutes=minutes
+        ).update(duration_minutes=minutes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0006_list_order_indexes'),
+        ('doctors', '0006_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='duration_minutes',
+            field=models.PositiveSmallIntegerField(default=30, editable=False),
+        ),
+        migrations.RunPython(fill_durations, migrations.RunPython.noop),
+    ]
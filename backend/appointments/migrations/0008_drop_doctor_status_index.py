@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:58
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0007_booking_duration'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appt_doctor_date_status_idx',
+        ),
+    ]
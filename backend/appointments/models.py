@@ -1,8 +1,7 @@
 from django.db import models
 from users.models import CustomUser
 from doctors.models import Doctor
-from django.core.exceptions import ValidationError
-from django.utils import timezone
+from .slots import validate_slot, validate_not_past, slot_length, ACTIVE_STATUSES, SLOT_MINUTES
 
 class Appointment(models.Model):
     STATUS_CHOICES = [
@@ -20,6 +19,9 @@ class Appointment(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     symptoms = models.TextField(blank=True)
     notes = models.TextField(blank=True)
+    # Minutes the booking blocks: the doctor's slot length plus buffer when it was booked,
+    # so a later change to either doesn't let a new slot overlap it
+    duration_minutes = models.PositiveSmallIntegerField(default=SLOT_MINUTES, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -28,35 +30,29 @@ class Appointment(models.Model):
     
     def clean(self):
         # Check if appointment is in the past
-        if self.appointment_date < timezone.now().date():
-            raise ValidationError("Appointment date cannot be in the past")
+        validate_not_past(self.appointment_date)
         
-        # Check if appointment time is available
-        if self.appointment_time:
-            # Check if doctor is available at this time
-            day_name = self.appointment_date.strftime('%A').lower()
-            try:
-                availability = self.doctor.availabilities.get(day=day_name)
-                if not availability.is_available:
-                    raise ValidationError("Doctor is not available on this day")
-                if self.appointment_time < availability.start_time or self.appointment_time > availability.end_time:
-                    raise ValidationError("Appointment time is outside doctor's available hours")
-            except:
-                raise ValidationError("Doctor is not available on this day")
-            
-            # Check for conflicting appointments
-            conflicting_appointments = Appointment.objects.filter(
-                doctor=self.doctor,
-                appointment_date=self.appointment_date,
-                appointment_time=self.appointment_time,
-                status__in=['pending', 'confirmed']
-            ).exclude(id=self.id)
-            
-            if conflicting_appointments.exists():
-                raise ValidationError("This time slot is already booked")
+        # Check the time against the doctor's free slots
+        if self.doctor_id and self.appointment_time:
+            validate_slot(self.doctor, self.appointment_date, self.appointment_time, exclude_id=self.id)
+            self.duration_minutes = sum(slot_length(self.doctor))
     
     class Meta:
         verbose_name = 'Appointment'
         verbose_name_plural = 'Appointments'
-        unique_together = ['doctor', 'appointment_date', 'appointment_time']
         ordering = ['appointment_date', 'appointment_time']
+        constraints = [
+            # Cancelled and finished appointments release their slot for rebooking.
+            # Also serves as the index for booked-slot lookups.
+            models.UniqueConstraint(
+                fields=['doctor', 'appointment_date', 'appointment_time'],
+                condition=models.Q(status__in=ACTIVE_STATUSES),
+                name='unique_active_booking',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['patient', 'appointment_date', 'appointment_time'], name='appt_patient_date_idx'),
+            # The list endpoints' cursor order, for doctors and for admins
+            models.Index(fields=['doctor', 'appointment_date', 'appointment_time'], name='appt_doctor_date_time_idx'),
+            models.Index(fields=['appointment_date', 'appointment_time', 'id'], name='appt_date_time_idx'),
+        ]
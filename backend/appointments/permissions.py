@@ -0,0 +1,53 @@
+"""
+Role checks for the appointment views, in one place.
+
+``user`` is either a CustomUser or a token-backed ClaimsUser; both expose
+id, user_type and doctor_id, so nothing here loads the user row.
+"""
+from doctors.models import Doctor
+from .models import Appointment
+
+ADMIN = 'admin'
+DOCTOR = 'doctor'
+PATIENT = 'user'
+
+
+def doctor_profile_id(user):
+    """The user's doctor profile id, or None, resolved at most once per request.
+
+    Falls back to a lookup when the token predates the doctor profile.
+    """
+    if user.user_type != DOCTOR:
+        return None
+    if user.doctor_id is None:
+        user.doctor_id = Doctor.objects.filter(user_id=user.id).values_list('id', flat=True).first()
+    return user.doctor_id
+
+
+def appointments_for(user):
+    """The appointments ``user`` may see: all for admins, their own for doctors and patients."""
+    if user.user_type == ADMIN:
+        return Appointment.objects.all()
+    if user.user_type == DOCTOR:
+        return Appointment.objects.filter(doctor_id=doctor_profile_id(user))
+    return Appointment.objects.filter(patient_id=user.id)
+
+
+def can_book(user):
+    # Admins book on behalf of patients; doctors don't book
+    return user.user_type in (ADMIN, PATIENT)
+
+
+def can_cancel(user, appointment):
+    if user.user_type == ADMIN:
+        return True
+    if user.user_type == DOCTOR:
+        return appointment.doctor_id == doctor_profile_id(user)
+    return appointment.patient_id == user.id
+
+
+def can_bulk_cancel(user, doctor, reassign_to=None):
+    # Admins may cancel or reassign for anyone; doctors may only cancel their own schedule
+    if user.user_type == ADMIN:
+        return True
+    return user.user_type == DOCTOR and reassign_to is None and doctor.id == doctor_profile_id(user)
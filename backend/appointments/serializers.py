@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import Appointment
 from users.serializers import UserProfileSerializer
+from doctors.models import Doctor
 from doctors.serializers import DoctorSerializer
 
 class AppointmentSerializer(serializers.ModelSerializer):
@@ -12,14 +13,33 @@ class AppointmentSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['patient', 'created_at', 'updated_at']
 
+class AppointmentDoctorSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source='user.get_full_name', read_only=True)
+    specialization = serializers.CharField(source='specialization.name', read_only=True)
+    
+    class Meta:
+        model = Doctor
+        fields = ['id', 'name', 'specialization']
+
+class AppointmentListSerializer(serializers.ModelSerializer):
+    patient = UserProfileSerializer(read_only=True)
+    doctor = AppointmentDoctorSerializer(read_only=True)
+    
+    class Meta:
+        model = Appointment
+        fields = '__all__'
+        read_only_fields = ['patient', 'created_at', 'updated_at']
+
 class AppointmentCreateSerializer(serializers.ModelSerializer):
+    # The slot length comes from the doctor's specialization
+    doctor = serializers.PrimaryKeyRelatedField(queryset=Doctor.objects.select_related('specialization'))
+    
     class Meta:
         model = Appointment
-        fields = ['doctor', 'appointment_date', 'appointment_time', 'symptoms', 'notes']
+        fields = ['id', 'doctor', 'appointment_date', 'appointment_time', 'symptoms', 'notes']
     
-    def validate(self, attrs):
-        # Additional validation can be added here
-        return attrs
+    # Schedule and conflict checks run in services.book_appointment, inside the
+    # booking transaction, rather than here where they could race
 
 class AppointmentUpdateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -32,3 +52,25 @@ class AppointmentUpdateSerializer(serializers.ModelSerializer):
         if current_status == 'completed' and value != 'completed':
             raise serializers.ValidationError("Cannot change status of completed appointment")
         return value
+
+class BulkAppointmentItemSerializer(serializers.Serializer):
+    # Plain ids: doctors and patients are resolved for the whole batch at once
+    patient = serializers.IntegerField(required=False)
+    doctor = serializers.IntegerField()
+    appointment_date = serializers.DateField()
+    appointment_time = serializers.TimeField()
+    symptoms = serializers.CharField(required=False, allow_blank=True, default='')
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+
+class BulkCancelSerializer(serializers.Serializer):
+    doctor = serializers.IntegerField()
+    start = serializers.DateField()
+    end = serializers.DateField()
+    reassign_to = serializers.IntegerField(required=False)
+    
+    def validate(self, attrs):
+        if attrs['end'] < attrs['start']:
+            raise serializers.ValidationError("End date must not be before start date")
+        if attrs.get('reassign_to') == attrs['doctor']:
+            raise serializers.ValidationError("Cannot reassign appointments to the same doctor")
+        return attrs
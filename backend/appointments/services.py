@@ -0,0 +1,225 @@
+"""
+Booking services: the write paths that create, cancel and move appointments.
+"""
+from collections import defaultdict
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, OperationalError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from appointment_system import metrics
+from doctors.calendar import intervals_for
+from doctors.models import Doctor
+from .models import Appointment
+from .slots import (
+    SlotTaken, ACTIVE_STATUSES, booking_interval, check_slot, slot_length, validate_not_past,
+    sync_cached_slot, update_cached_slot, invalidate_doctor_slots
+)
+
+# Attempts before giving up on a booking transaction that keeps hitting a database lock
+LOCK_RETRIES = 3
+
+
+class BookingConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'This time slot is already booked'
+    default_code = 'conflict'
+
+
+def book_appointment(patient_id, doctor, appointment_date, appointment_time, **fields):
+    """Validate and create an appointment in one transaction.
+
+    Raises django's ValidationError for schedule problems and BookingConflict when the
+    slot is taken, including when a concurrent booking wins the race for it.
+    """
+    appointment = Appointment(
+        patient_id=patient_id,
+        doctor=doctor,
+        appointment_date=appointment_date,
+        appointment_time=appointment_time,
+        **fields
+    )
+    _save_checked(appointment)
+    metrics.BOOKINGS.inc()
+    sync_cached_slot(appointment)
+    return appointment
+
+
+def update_appointment(appointment, **changes):
+    """Apply ``changes`` to an existing appointment and save it.
+
+    A new date or time, or a move back to an active status, is validated against the
+    doctor's schedule under the same lock as book_appointment, with the same errors.
+    """
+    previous_slot = appointment.appointment_date, appointment.appointment_time
+    previous_minutes = appointment.duration_minutes
+    was_active = appointment.status in ACTIVE_STATUSES
+    for field, value in changes.items():
+        setattr(appointment, field, value)
+    moved = previous_slot != (appointment.appointment_date, appointment.appointment_time)
+
+    if appointment.status in ACTIVE_STATUSES and (moved or not was_active):
+        _save_checked(appointment)
+    else:
+        appointment.save()
+
+    if was_active and moved:
+        update_cached_slot(appointment.doctor_id, *previous_slot, previous_minutes, booked=False)
+    sync_cached_slot(appointment)
+    return appointment
+
+
+def _save_checked(appointment):
+    # Runs clean() and saves in one transaction holding the doctor's lock, retrying
+    # while the database is locked and turning a taken slot into BookingConflict
+    creating = appointment._state.adding
+    for attempt in range(LOCK_RETRIES):
+        if creating:
+            appointment.id = None
+            appointment._state.adding = True
+        try:
+            with transaction.atomic():
+                # Serializes bookings per doctor on backends with row locks; SQLite
+                # serializes all writers and the unique constraint backs both up
+                _lock_doctors([appointment.doctor_id])
+                appointment.clean()
+                appointment.save()
+            return
+        except SlotTaken as e:
+            metrics.BOOKING_CONFLICTS.inc()
+            raise BookingConflict(e.messages[0])
+        except IntegrityError:
+            metrics.BOOKING_CONFLICTS.inc()
+            # The cache missed the booking that holds this slot
+            invalidate_doctor_slots(appointment.doctor_id)
+            raise BookingConflict()
+        except OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            if attempt == LOCK_RETRIES - 1:
+                metrics.BOOKING_CONFLICTS.inc()
+                raise BookingConflict('The schedule is busy, please try again')
+
+
+def _lock_doctors(doctor_ids):
+    list(Doctor.objects.select_for_update().filter(id__in=doctor_ids).values_list('id', flat=True))
+
+
+def _schedule_snapshot(doctors, start, end):
+    # Working intervals and booked (start, end) minutes, both keyed by (doctor_id, date)
+    intervals = intervals_for(doctors, start, end)
+    booked = defaultdict(list)
+    appointments = Appointment.objects.filter(
+        doctor_id__in=[doctor.id for doctor in doctors],
+        appointment_date__range=(start, end),
+        status__in=ACTIVE_STATUSES
+    ).order_by().values_list('doctor_id', 'appointment_date', 'appointment_time', 'duration_minutes')
+    for doctor_id, appointment_date, appointment_time, minutes in appointments:
+        booked[doctor_id, appointment_date].append(booking_interval(appointment_time, minutes))
+    return intervals, booked
+
+
+def bulk_book_appointments(items):
+    """Create many appointments in one transaction.
+
+    ``items`` are dicts of Appointment field values including ``patient_id`` and ``doctor``.
+    Every item is checked against one snapshot of the affected schedules, valid ones are
+    inserted with a single bulk_create, and a result dict is returned per item, in order.
+    """
+    if not items:
+        return []
+    doctors = list({item['doctor'].id: item['doctor'] for item in items}.values())
+    dates = [item['appointment_date'] for item in items]
+    results = [None] * len(items)
+    pending = []
+
+    try:
+        with transaction.atomic():
+            _lock_doctors([doctor.id for doctor in doctors])
+            intervals, booked = _schedule_snapshot(doctors, min(dates), max(dates))
+            lengths = {doctor.id: slot_length(doctor) for doctor in doctors}
+
+            for index, item in enumerate(items):
+                doctor_id, day, slot_time = item['doctor'].id, item['appointment_date'], item['appointment_time']
+                try:
+                    validate_not_past(day)
+                    check_slot(intervals.get((doctor_id, day)), booked[doctor_id, day], slot_time, *lengths[doctor_id])
+                except ValidationError as e:
+                    if isinstance(e, SlotTaken):
+                        metrics.BOOKING_CONFLICTS.inc()
+                    results[index] = {'index': index, 'status': 'error', 'error': e.messages[0]}
+                    continue
+                # Later items in the same batch must not overlap this slot
+                minutes = sum(lengths[doctor_id])
+                booked[doctor_id, day].append(booking_interval(slot_time, minutes))
+                pending.append((index, Appointment(**item, duration_minutes=minutes)))
+
+            created = Appointment.objects.bulk_create([appointment for _, appointment in pending])
+    except IntegrityError:
+        metrics.BOOKING_CONFLICTS.inc(len(pending))
+        raise BookingConflict('Some slots were booked concurrently; no appointments were created')
+    except OperationalError as e:
+        if 'locked' not in str(e):
+            raise
+        metrics.BOOKING_CONFLICTS.inc(len(items))
+        raise BookingConflict('The schedule is busy, please try again')
+
+    metrics.BOOKINGS.inc(len(created))
+    for (index, _), appointment in zip(pending, created):
+        sync_cached_slot(appointment)
+        results[index] = {'index': index, 'status': 'created', 'id': appointment.id}
+    return results
+
+
+def bulk_cancel_appointments(doctor, start, end, reassign_to=None):
+    """Cancel, or move to ``reassign_to``, every active appointment of ``doctor`` between two dates.
+
+    Appointments that cannot be moved because the other doctor is unavailable or already
+    booked at that time are left untouched and reported as errors. Raises BookingConflict,
+    changing nothing, when a concurrent booking takes one of the slots being moved into.
+    """
+    doctor_ids = {doctor.id} if reassign_to is None else {doctor.id, reassign_to.id}
+    now = timezone.now()
+
+    try:
+        with transaction.atomic():
+            _lock_doctors(doctor_ids)
+            appointments = list(Appointment.objects.filter(
+                doctor=doctor,
+                appointment_date__range=(start, end),
+                status__in=ACTIVE_STATUSES
+            ).values_list('id', 'appointment_date', 'appointment_time'))
+
+            if reassign_to is None:
+                ids = [appointment_id for appointment_id, _, _ in appointments]
+                Appointment.objects.filter(id__in=ids).update(status='cancelled', updated_at=now)
+                results = [{'id': appointment_id, 'status': 'cancelled'} for appointment_id in ids]
+            else:
+                intervals, booked = _schedule_snapshot([reassign_to], start, end)
+                length = slot_length(reassign_to)
+                moved, results = [], []
+                for appointment_id, day, slot_time in appointments:
+                    try:
+                        check_slot(intervals.get((reassign_to.id, day)), booked[reassign_to.id, day], slot_time, *length)
+                    except ValidationError as e:
+                        results.append({'id': appointment_id, 'status': 'error', 'error': e.messages[0]})
+                        continue
+                    booked[reassign_to.id, day].append(booking_interval(slot_time, sum(length)))
+                    moved.append(appointment_id)
+                    results.append({'id': appointment_id, 'status': 'reassigned', 'doctor': reassign_to.id})
+                Appointment.objects.filter(id__in=moved).update(
+                    doctor=reassign_to, duration_minutes=sum(length), updated_at=now
+                )
+    except IntegrityError:
+        # Another booking took a slot on reassign_to after the snapshot
+        metrics.BOOKING_CONFLICTS.inc()
+        raise BookingConflict('Some slots were booked concurrently; no appointments were changed')
+    except OperationalError as e:
+        if 'locked' not in str(e):
+            raise
+        metrics.BOOKING_CONFLICTS.inc()
+        raise BookingConflict('The schedule is busy, please try again')
+
+    for doctor_id in doctor_ids:
+        invalidate_doctor_slots(doctor_id)
+    return results
@@ -0,0 +1,29 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from doctors.calendar import calendar_refreshed
+from doctors.models import Doctor, Specialization, DoctorAvailability, AvailabilityOverride
+from .slots import invalidate_doctor_slots
+
+
+@receiver([post_save, post_delete], sender=DoctorAvailability)
+@receiver([post_save, post_delete], sender=AvailabilityOverride)
+def availability_changed(sender, instance, **kwargs):
+    invalidate_doctor_slots(instance.doctor_id)
+
+
+@receiver([post_save, post_delete], sender=Doctor)
+def doctor_changed(sender, instance, **kwargs):
+    # The slot length or buffer may have changed, or cached slots now belong to no one
+    invalidate_doctor_slots(instance.id)
+
+
+@receiver(post_save, sender=Specialization)
+def specialization_changed(sender, instance, **kwargs):
+    for doctor_id in Doctor.objects.filter(specialization_id=instance.id, slot_minutes__isnull=True).values_list('id', flat=True):
+        invalidate_doctor_slots(doctor_id)
+
+
+@receiver(calendar_refreshed, sender=Doctor)
+def calendar_changed(sender, doctor_ids, **kwargs):
+    for doctor_id in doctor_ids:
+        invalidate_doctor_slots(doctor_id)
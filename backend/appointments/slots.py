@@ -0,0 +1,362 @@
+import heapq
+import uuid
+from collections import defaultdict
+from datetime import time, timedelta
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from appointment_system import metrics
+from appointment_system.routers import replica_reads
+from doctors.calendar import intervals_for
+from doctors.models import Doctor
+
+# Appointments in these states occupy their time slot
+ACTIVE_STATUSES = ['pending', 'confirmed']
+
+SLOT_MINUTES = 30
+
+# Longest window the range endpoint will compute in one request
+MAX_RANGE_DAYS = 31
+
+
+class SlotTaken(ValidationError):
+    """The requested time is in the doctor's schedule but already booked."""
+
+
+def to_minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def from_minutes(minutes):
+    return time(minutes // 60, minutes % 60)
+
+
+def format_slot(minutes):
+    return '%02d:%02d' % divmod(minutes, 60)
+
+
+def date_range(start, end):
+    day = start
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+
+def get_intervals(doctor, day):
+    """The doctor's working (start_time, end_time) intervals on ``day``; empty when not working."""
+    return intervals_for([doctor], day, day).get((doctor.id, day), [])
+
+
+def slot_length(doctor):
+    """(duration, buffer) in minutes of the doctor's appointments.
+
+    Reads ``doctor.specialization`` unless the doctor sets a duration, so select it alongside.
+    """
+    return doctor.slot_minutes or doctor.specialization.slot_minutes, doctor.buffer_minutes
+
+
+def schedule_slots(intervals, duration=SLOT_MINUTES, buffer=0):
+    """Sorted start minute of every slot that fits inside a day's working intervals."""
+    ranges = [
+        range(to_minutes(start_time), to_minutes(end_time) - duration + 1, duration + buffer)
+        for start_time, end_time in intervals
+    ]
+    if len(ranges) == 1:
+        return list(ranges[0])
+    return sorted({minute for minutes in ranges for minute in minutes})
+
+
+def slot_table(intervals, lengths):
+    """Slot start minutes for many doctors and days in one pass.
+
+    ``intervals`` maps (doctor_id, date) to working intervals, as returned by intervals_for(),
+    and ``lengths`` maps doctor_id to its slot_length(). Days without intervals are omitted.
+    """
+    return {key: schedule_slots(rows, *lengths[key[0]]) for key, rows in intervals.items()}
+
+
+def booking_interval(slot_time, minutes):
+    """The (start, end) minutes a booking of ``minutes`` starting at ``slot_time`` blocks."""
+    start = to_minutes(slot_time)
+    return start, start + minutes
+
+
+def overlaps(minute, span, bookings):
+    """Whether a slot blocking ``span`` minutes from ``minute`` overlaps any (start, end) booking."""
+    return any(start < minute + span and minute < end for start, end in bookings)
+
+
+def booked_intervals(doctor, day, exclude_id=None):
+    """(start, end) minutes of all active bookings for the doctor on ``day``, in a single query."""
+    appointments = doctor.doctor_appointments.filter(appointment_date=day, status__in=ACTIVE_STATUSES)
+    if exclude_id is not None:
+        appointments = appointments.exclude(id=exclude_id)
+    return [
+        booking_interval(slot_time, minutes)
+        for slot_time, minutes in appointments.order_by().values_list('appointment_time', 'duration_minutes')
+    ]
+
+
+def to_bitmap(minutes):
+    bits = 0
+    for minute in minutes:
+        bits |= 1 << minute
+    return bits
+
+
+def from_bitmap(bits):
+    """Sorted minutes whose bit is set."""
+    minutes = []
+    while bits:
+        lowest = bits & -bits
+        minutes.append(lowest.bit_length() - 1)
+        bits ^= lowest
+    return minutes
+
+
+def _free_bitmap(schedule, span, bookings):
+    return to_bitmap(minute for minute in schedule if not overlaps(minute, span, bookings))
+
+
+def _slot_entry(schedule, span, bookings):
+    # Cache entry: the schedule and free bitmaps, the span of each slot and the
+    # booked intervals, which let update_cached_slot() recompute the free bitmap
+    return to_bitmap(schedule), _free_bitmap(schedule, span, bookings), span, tuple(sorted(bookings))
+
+
+EMPTY_ENTRY = (0, 0, 0, ())
+
+
+def build_slot_bitmaps(doctor, day):
+    """(schedule, free, span, bookings) for the doctor's day; bit N stands for a slot starting at minute N."""
+    intervals = get_intervals(doctor, day)
+    if not intervals:
+        return EMPTY_ENTRY
+    duration, buffer = slot_length(doctor)
+    schedule = schedule_slots(intervals, duration, buffer)
+    return _slot_entry(schedule, duration + buffer, booked_intervals(doctor, day))
+
+
+# Slot bitmap cache. Entries are keyed by a per-doctor generation token that is
+# replaced whenever the doctor's availability changes; bookings update the
+# cached bitmaps in place.
+
+def _slot_cache_key(doctor_id, day, create=True):
+    # With create=False, None when nothing has been cached for the doctor yet; lookups
+    # by id pass it so that ids of doctors that don't exist never add cache entries
+    generation_key = f'slots:gen:{doctor_id}'
+    generation = cache.get(generation_key)
+    if generation is None:
+        if not create:
+            return None
+        cache.add(generation_key, uuid.uuid4().hex, None)
+        generation = cache.get(generation_key)
+    return f'slots:{doctor_id}:{generation}:{day.isoformat()}'
+
+
+async def _aslot_cache_key(doctor_id, day, create=True):
+    generation_key = f'slots:gen:{doctor_id}'
+    generation = await cache.aget(generation_key)
+    if generation is None:
+        if not create:
+            return None
+        await cache.aadd(generation_key, uuid.uuid4().hex, None)
+        generation = await cache.aget(generation_key)
+    return f'slots:{doctor_id}:{generation}:{day.isoformat()}'
+
+
+def invalidate_doctor_slots(doctor_id):
+    cache.set(f'slots:gen:{doctor_id}', uuid.uuid4().hex, None)
+
+
+def cached_free_slots(doctor_id, day):
+    """Free slot minutes from the cache, or None on a miss; never writes to the cache."""
+    key = _slot_cache_key(doctor_id, day, create=False)
+    entry = cache.get(key) if key else None
+    if entry is None:
+        # Counted by the free_slots() call that follows a miss
+        return None
+    metrics.SLOT_CACHE.inc(result='hit')
+    return from_bitmap(entry[1])
+
+
+def free_slots(doctor, day):
+    """Sorted start minutes of the doctor's unbooked slots on ``day``, building the cache entry on a miss."""
+    key = _slot_cache_key(doctor.id, day)
+    entry = cache.get(key)
+    metrics.SLOT_CACHE.inc(result='miss' if entry is None else 'hit')
+    if entry is None:
+        # Entries outlive the request, so build them from the primary rather than a replica that may lag
+        with replica_reads(False):
+            entry = build_slot_bitmaps(doctor, day)
+        cache.set(key, entry, settings.SLOT_CACHE_TIMEOUT)
+    return from_bitmap(entry[1])
+
+
+async def afree_slots(doctor_id, day):
+    """Async free_slots() by doctor id; None when there is no such doctor."""
+    key = await _aslot_cache_key(doctor_id, day, create=False)
+    entry = await cache.aget(key) if key else None
+    metrics.SLOT_CACHE.inc(result='miss' if entry is None else 'hit')
+    if entry is None:
+        with replica_reads(False):
+            try:
+                doctor = await Doctor.objects.select_related('specialization').aget(id=doctor_id)
+            except Doctor.DoesNotExist:
+                return None
+            key = key or await _aslot_cache_key(doctor_id, day)
+            intervals = await sync_to_async(get_intervals)(doctor, day)
+            if intervals:
+                duration, buffer = slot_length(doctor)
+                schedule = schedule_slots(intervals, duration, buffer)
+                booked = [
+                    booking_interval(slot_time, minutes) async for slot_time, minutes in doctor.doctor_appointments.filter(
+                        appointment_date=day, status__in=ACTIVE_STATUSES
+                    ).order_by().values_list('appointment_time', 'duration_minutes')
+                ]
+                entry = _slot_entry(schedule, duration + buffer, booked)
+            else:
+                entry = EMPTY_ENTRY
+        await cache.aset(key, entry, settings.SLOT_CACHE_TIMEOUT)
+    return from_bitmap(entry[1])
+
+
+def update_cached_slot(doctor_id, day, slot_time, minutes, booked):
+    """Add or remove one booking of ``minutes`` in the cached entry, if that day is cached.
+
+    Every slot the booking overlaps is marked taken, or free again when no other
+    booking overlaps it. Bookings are always validated against the database, so a
+    concurrent lost update only shows a stale slot until the entry expires.
+    """
+    key = _slot_cache_key(doctor_id, day, create=False)
+    entry = cache.get(key) if key else None
+    if entry is None:
+        return
+    schedule, _, span, bookings = entry
+    interval = booking_interval(slot_time, minutes)
+    bookings = list(bookings)
+    if booked:
+        if interval in bookings:
+            return
+        bookings.append(interval)
+    elif interval in bookings:
+        bookings.remove(interval)
+    else:
+        return
+    cache.set(key, _slot_entry(from_bitmap(schedule), span, bookings), settings.SLOT_CACHE_TIMEOUT)
+
+
+def sync_cached_slot(appointment):
+    update_cached_slot(
+        appointment.doctor_id,
+        appointment.appointment_date,
+        appointment.appointment_time,
+        appointment.duration_minutes,
+        booked=appointment.status in ACTIVE_STATUSES
+    )
+
+
+def free_slots_for_range(doctor, start, end):
+    """Map every date from ``start`` to ``end`` inclusive to its free slot minutes.
+
+    Loads the working intervals and all active bookings in the window in one query each.
+    """
+    length = slot_length(doctor)
+    schedule = slot_table(intervals_for([doctor], start, end), {doctor.id: length})
+    span = sum(length)
+
+    booked = defaultdict(list)
+    appointments = doctor.doctor_appointments.filter(
+        appointment_date__range=(start, end),
+        status__in=ACTIVE_STATUSES
+    ).order_by().values_list('appointment_date', 'appointment_time', 'duration_minutes')
+    for appointment_date, appointment_time, minutes in appointments:
+        booked[appointment_date].append(booking_interval(appointment_time, minutes))
+
+    slots = {}
+    for day in date_range(start, end):
+        taken = booked[day]
+        slots[day] = [minute for minute in schedule.get((doctor.id, day), []) if not overlaps(minute, span, taken)]
+    return slots
+
+
+def _iter_doctor_slots(doctor_id, schedule, span, booked, start, end, earliest=0):
+    # Yields (date, minute, doctor_id) in chronological order for a single doctor,
+    # skipping slots on ``start`` that begin before minute ``earliest``
+    for day in date_range(start, end):
+        taken = booked.get((doctor_id, day), ())
+        for minute in schedule.get((doctor_id, day), []):
+            if day == start and minute < earliest:
+                continue
+            if not overlaps(minute, span, taken):
+                yield day, minute, doctor_id
+
+
+def first_free_slots(doctors, start, end, limit):
+    """Return the ``limit`` earliest free (date, minute, doctor_id) slots across ``doctors``.
+
+    ``doctors`` is a Doctor queryset. Their working intervals and the bookings in the window
+    are fetched in a bounded number of queries and the per-doctor slot streams are heap-merged.
+    Only slots from now on are returned.
+    """
+    from .models import Appointment
+
+    now = timezone.localtime()
+    if start <= now.date():
+        start, earliest = now.date(), to_minutes(now) + 1
+    else:
+        earliest = 0
+    if end < start:
+        return []
+
+    doctors = list(doctors.select_related('specialization').only(
+        'id', 'calendar_until', 'slot_minutes', 'buffer_minutes', 'specialization__slot_minutes'
+    ))
+    lengths = {doctor.id: slot_length(doctor) for doctor in doctors}
+    schedule = slot_table(intervals_for(doctors, start, end), lengths)
+
+    booked = defaultdict(list)
+    for doctor_id, appointment_date, appointment_time, minutes in Appointment.objects.filter(
+        doctor__in=doctors,
+        appointment_date__range=(start, end),
+        status__in=ACTIVE_STATUSES
+    ).order_by().values_list('doctor_id', 'appointment_date', 'appointment_time', 'duration_minutes'):
+        booked[doctor_id, appointment_date].append(booking_interval(appointment_time, minutes))
+
+    streams = [
+        _iter_doctor_slots(doctor.id, schedule, sum(lengths[doctor.id]), booked, start, end, earliest)
+        for doctor in doctors
+    ]
+    return list(islice(heapq.merge(*streams), limit))
+
+
+def validate_not_past(day):
+    if day < timezone.now().date():
+        raise ValidationError("Appointment date cannot be in the past")
+
+
+def check_slot(intervals, booked, slot_time, duration=SLOT_MINUTES, buffer=0):
+    """Raise ValidationError unless ``slot_time`` is free given the day's working intervals and booked intervals.
+
+    A slot is taken when it overlaps any booking, not only one starting at the same minute,
+    so bookings made before a change to the slot length or the schedule still block it.
+    """
+    if not intervals:
+        raise ValidationError("Doctor is not available on this day")
+
+    minute = to_minutes(slot_time)
+    if slot_time.second or minute not in schedule_slots(intervals, duration, buffer):
+        raise ValidationError("Appointment time is outside doctor's available hours")
+
+    if overlaps(minute, duration + buffer, booked):
+        raise SlotTaken("This time slot is already booked")
+
+
+def validate_slot(doctor, day, slot_time, exclude_id=None):
+    """Raise ValidationError unless ``slot_time`` is a free slot in the doctor's schedule."""
+    intervals = get_intervals(doctor, day)
+    booked = booked_intervals(doctor, day, exclude_id=exclude_id) if intervals else []
+    check_slot(intervals, booked, slot_time, *slot_length(doctor))
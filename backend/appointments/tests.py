@@ -0,0 +1,427 @@
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from doctors.models import Doctor, DoctorAvailability, Specialization
+from users.models import CustomUser
+from users.tokens import UserRefreshToken
+from . import services
+from .models import Appointment
+from .slots import _slot_cache_key, build_slot_bitmaps, free_slots
+from .views import MAX_BULK_ITEMS
+
+
+def next_monday():
+    day = date.today() + timedelta(days=1)
+    while day.weekday() != 0:
+        day += timedelta(days=1)
+    return day
+
+
+def create_doctor(username, specialization):
+    user = CustomUser.objects.create_user(username=username, password='password123', user_type='doctor')
+    doctor = Doctor.objects.create(user=user, specialization=specialization, license_number=username, consultation_fee=100)
+    DoctorAvailability.objects.create(doctor=doctor, day='monday', start_time=time(9), end_time=time(12))
+    return doctor
+
+
+class AppointmentUpdateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = create_doctor('doctor', Specialization.objects.create(name='Cardiology'))
+        self.patient = CustomUser.objects.create_user(username='patient', password='password123')
+        self.day = next_monday()
+        self.appointment = Appointment.objects.create(
+            patient=self.patient, doctor=self.doctor, appointment_date=self.day, appointment_time=time(9)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.patient)
+        self.url = f'/api/appointments/{self.appointment.id}/'
+
+    def test_time_outside_schedule_is_rejected(self):
+        response = self.client.patch(self.url, {'appointment_time': '03:17'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.appointment_time, time(9))
+
+    def test_taken_slot_is_a_conflict(self):
+        other = CustomUser.objects.create_user(username='other', password='password123')
+        Appointment.objects.create(patient=other, doctor=self.doctor, appointment_date=self.day, appointment_time=time(10))
+        response = self.client.patch(self.url, {'appointment_time': '10:00'}, format='json')
+        self.assertEqual(response.status_code, 409)
+
+    def test_reschedule_frees_the_previous_slot(self):
+        slots_url = f'/api/doctors/{self.doctor.id}/available-slots/?date={self.day}'
+        self.assertNotIn('09:00', self.client.get(slots_url).data['available_slots'])
+        response = self.client.patch(self.url, {'appointment_time': '10:30'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        slots = self.client.get(slots_url).data['available_slots']
+        self.assertIn('09:00', slots)
+        self.assertNotIn('10:30', slots)
+
+    def test_notes_only_update_skips_schedule_check(self):
+        Appointment.objects.filter(id=self.appointment.id).update(appointment_time=time(3, 17))
+        response = self.client.patch(self.url, {'notes': 'Bring test results'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_doctor_is_a_validation_error(self):
+        appointment = Appointment(patient=self.patient, appointment_date=self.day, appointment_time=time(9))
+        with self.assertRaises(ValidationError) as raised:
+            appointment.full_clean()
+        self.assertIn('doctor', raised.exception.message_dict)
+
+
+class SlotOverlapTests(TestCase):
+    """Bookings block the time they were made for, even after the doctor's slot length changes."""
+
+    def setUp(self):
+        cache.clear()
+        self.doctor = create_doctor('doctor', Specialization.objects.create(name='Cardiology'))
+        self.day = next_monday()
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(username='patient', password='password123'))
+
+    def book(self, slot):
+        return self.client.post(
+            '/api/appointments/',
+            {'doctor': self.doctor.id, 'appointment_date': self.day, 'appointment_time': slot},
+            format='json'
+        )
+
+    def free(self):
+        response = self.client.get(f'/api/doctors/{self.doctor.id}/available-slots/?date={self.day}')
+        range_response = self.client.get(
+            f'/api/doctors/{self.doctor.id}/available-slots/range/?start={self.day}&end={self.day}'
+        )
+        slots = response.data['available_slots']
+        self.assertEqual(range_response.data['available_slots'][self.day.isoformat()], slots)
+        return slots
+
+    def set_slot_minutes(self, minutes):
+        self.doctor.slot_minutes = minutes
+        self.doctor.save()
+
+    def test_longer_slots_overlapping_a_booking_are_taken(self):
+        self.assertEqual(self.book('09:30').status_code, 201)
+        self.set_slot_minutes(60)
+        self.assertEqual(self.free(), ['10:00', '11:00'])
+        self.assertEqual(self.book('09:00').status_code, 409)
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_shorter_slots_inside_a_booking_are_taken(self):
+        self.set_slot_minutes(60)
+        self.assertEqual(self.book('09:00').status_code, 201)
+        self.set_slot_minutes(30)
+        self.assertEqual(self.free(), ['10:00', '10:30', '11:00', '11:30'])
+        self.assertEqual(self.book('09:30').status_code, 409)
+
+    def test_buffer_blocks_the_next_slot(self):
+        self.doctor.buffer_minutes = 15
+        self.doctor.save()
+        self.assertEqual(self.book('09:00').status_code, 201)
+        # The 45-minute grid moves to 30 minutes; 09:30 falls in the first booking's buffer
+        self.doctor.buffer_minutes = 0
+        self.doctor.save()
+        self.assertNotIn('09:30', self.free())
+        self.assertEqual(self.book('09:30').status_code, 409)
+        self.assertEqual(self.book('10:00').status_code, 201)
+
+
+class SlotCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = create_doctor('doctor', Specialization.objects.create(name='Cardiology'))
+        self.day = next_monday()
+        patient = CustomUser.objects.create_user(username='patient', password='password123')
+        self.client = APIClient()
+        # A token rather than force_authenticate, for the async endpoint
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {UserRefreshToken.for_user(patient).access_token}')
+        self.url = f'/api/doctors/{self.doctor.id}/available-slots/?date={self.day}'
+
+    def slots(self):
+        return self.client.get(self.url).data['available_slots']
+
+    def test_unknown_doctor_leaves_no_cache_entry(self):
+        for url in (f'/api/doctors/999/available-slots/?date={self.day}', f'/api/async/doctors/999/available-slots/?date={self.day}'):
+            with self.subTest(url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+                self.assertIsNone(cache.get('slots:gen:999'))
+
+    def test_cache_hit_runs_no_queries(self):
+        self.slots()
+        with self.assertNumQueries(0):
+            self.assertIn('09:00', self.slots())
+
+    def test_booking_and_cancel_update_cached_slots(self):
+        self.assertIn('09:00', self.slots())
+        response = self.client.post(
+            '/api/appointments/', {'doctor': self.doctor.id, 'appointment_date': self.day, 'appointment_time': '09:00'},
+            format='json'
+        )
+        self.assertNotIn('09:00', self.slots())
+        self.client.post(f"/api/appointments/{response.data['id']}/cancel/")
+        self.assertIn('09:00', self.slots())
+
+    def test_availability_change_invalidates_cached_slots(self):
+        self.assertEqual(len(self.slots()), 6)
+        availability = self.doctor.availabilities.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            availability.end_time = time(10)
+            availability.save()
+        self.assertEqual(self.slots(), ['09:00', '09:30'])
+
+    def test_deleted_doctor_is_not_served_from_the_cache(self):
+        self.slots()
+        self.doctor.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class SlotBitmapTests(TestCase):
+    """Bookings update the cached bitmaps in place; they must match a rebuild from the database."""
+
+    def setUp(self):
+        cache.clear()
+        self.doctor = create_doctor('doctor', Specialization.objects.create(name='Cardiology'))
+        self.patient = CustomUser.objects.create_user(username='patient', password='password123')
+        self.day = next_monday()
+        self.client = APIClient()
+        self.client.force_authenticate(self.patient)
+        free_slots(self.doctor, self.day)
+
+    def assertCacheMatchesRebuild(self, event):
+        cached = cache.get(_slot_cache_key(self.doctor.id, self.day, create=False))
+        self.assertIsNotNone(cached, event)
+        self.assertEqual(cached, build_slot_bitmaps(self.doctor, self.day), event)
+
+    def book(self, hour, minute=0):
+        return services.book_appointment(self.patient.id, self.doctor, self.day, time(hour, minute))
+
+    def test_incremental_updates_match_a_rebuild(self):
+        first = self.book(9)
+        self.assertCacheMatchesRebuild('create')
+        second = self.book(10, 30)
+        self.assertCacheMatchesRebuild('second create')
+
+        self.client.post(f'/api/appointments/{first.id}/cancel/')
+        self.assertCacheMatchesRebuild('cancel')
+
+        services.update_appointment(second, status='completed')
+        self.assertCacheMatchesRebuild('completed')
+        services.update_appointment(second, status='confirmed')
+        self.assertCacheMatchesRebuild('back to confirmed')
+
+        services.update_appointment(second, appointment_time=time(11))
+        self.assertCacheMatchesRebuild('reschedule')
+        services.update_appointment(second, notes='Bring test results')
+        self.assertCacheMatchesRebuild('notes only')
+
+        self.client.delete(f'/api/appointments/{second.id}/')
+        self.assertCacheMatchesRebuild('delete')
+
+    def test_bulk_booking_matches_a_rebuild(self):
+        self.client.post('/api/appointments/bulk/', {'appointments': [
+            {'doctor': self.doctor.id, 'appointment_date': self.day, 'appointment_time': slot}
+            for slot in ('09:00', '09:30', '11:30')
+        ]}, format='json')
+        self.assertCacheMatchesRebuild('bulk create')
+
+    def test_overlapping_booking_matches_a_rebuild(self):
+        # A booking longer than today's slots blocks two of them
+        Appointment.objects.create(
+            patient=self.patient, doctor=self.doctor, appointment_date=self.day, appointment_time=time(10),
+            duration_minutes=60
+        )
+        cache.clear()
+        free_slots(self.doctor, self.day)
+        appointment = self.book(11)
+        self.assertCacheMatchesRebuild('create next to a long booking')
+        self.client.post(f'/api/appointments/{appointment.id}/cancel/')
+        self.assertCacheMatchesRebuild('cancel next to a long booking')
+        self.assertNotIn(10 * 60 + 30, free_slots(self.doctor, self.day))
+
+
+class FirstAvailableTests(TestCase):
+    def setUp(self):
+        self.specialization = Specialization.objects.create(name='Cardiology')
+        doctor = create_doctor('doctor', self.specialization)
+        for day in ('tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday'):
+            DoctorAvailability.objects.create(doctor=doctor, day=day, start_time=time(0), end_time=time(23, 30))
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(username='patient', password='password123'))
+
+    def test_past_start_only_returns_future_slots(self):
+        today = timezone.localdate()
+        response = self.client.get(
+            f'/api/specializations/{self.specialization.id}/first-available/?start={today - timedelta(days=5)}&limit=1'
+        )
+        self.assertEqual(response.status_code, 200)
+        slot = response.data['slots'][0]
+        starts_at = datetime.combine(date.fromisoformat(slot['date']), time.fromisoformat(slot['time']))
+        self.assertGreater(starts_at, timezone.localtime().replace(tzinfo=None))
+
+    def test_window_entirely_in_the_past(self):
+        today = timezone.localdate()
+        response = self.client.get(
+            f'/api/specializations/{self.specialization.id}/first-available/'
+            f'?start={today - timedelta(days=5)}&end={today - timedelta(days=1)}'
+        )
+        self.assertEqual(response.data['slots'], [])
+
+
+class BookingPermissionTests(TestCase):
+    """Doctors can't book, through either the single or the bulk endpoint."""
+
+    def setUp(self):
+        self.doctor = create_doctor('doctor', Specialization.objects.create(name='Cardiology'))
+        self.booking = {'doctor': self.doctor.id, 'appointment_date': next_monday(), 'appointment_time': '09:00'}
+        self.client = APIClient()
+
+    def test_doctor_cannot_book(self):
+        self.client.force_authenticate(self.doctor.user)
+        response = self.client.post('/api/appointments/', self.booking, format='json')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.post('/api/appointments/bulk/', {'appointments': [self.booking]}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Appointment.objects.exists())
+
+    def test_patient_can_book(self):
+        self.client.force_authenticate(CustomUser.objects.create_user(username='patient', password='password123'))
+        response = self.client.post('/api/appointments/', self.booking, format='json')
+        self.assertEqual(response.status_code, 201)
+        booking = dict(self.booking, appointment_time='09:30')
+        response = self.client.post('/api/appointments/bulk/', {'appointments': [booking]}, format='json')
+        self.assertEqual(response.data['created'], 1)
+
+
+class BulkBookingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = create_doctor('doctor', Specialization.objects.create(name='Cardiology'))
+        self.patient = CustomUser.objects.create_user(username='patient', password='password123')
+        self.day = next_monday()
+        self.client = APIClient()
+        self.client.force_authenticate(self.patient)
+
+    def item(self, slot, doctor=None):
+        return {'doctor': doctor or self.doctor.id, 'appointment_date': self.day, 'appointment_time': slot}
+
+    def book(self, *items):
+        return self.client.post('/api/appointments/bulk/', {'appointments': list(items)}, format='json')
+
+    def test_results_per_item(self):
+        response = self.book(self.item('09:00'), self.item('09:00'), self.item('03:00'), self.item('10:00', doctor=999))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 1)
+        results = response.data['results']
+        self.assertEqual([result['index'] for result in results], [0, 1, 2, 3])
+        self.assertEqual([result['status'] for result in results], ['created', 'error', 'error', 'error'])
+        self.assertEqual(results[0]['id'], Appointment.objects.get().id)
+        self.assertEqual(results[1]['error'], 'This time slot is already booked')
+        self.assertEqual(results[3]['error'], 'Unknown doctor')
+
+    def test_concurrent_booking_creates_nothing(self):
+        Appointment.objects.create(patient=self.patient, doctor=self.doctor, appointment_date=self.day, appointment_time=time(9))
+        snapshot = services._schedule_snapshot
+
+        def stale_snapshot(*args):
+            # As if the 09:00 booking landed after the batch read the schedule
+            intervals, _ = snapshot(*args)
+            return intervals, defaultdict(list)
+
+        with mock.patch.object(services, '_schedule_snapshot', stale_snapshot):
+            response = self.book(self.item('10:00'), self.item('09:00'))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_item_limit(self):
+        response = self.book(*[self.item('09:00')] * (MAX_BULK_ITEMS + 1))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Appointment.objects.exists())
+
+
+class BulkCancelTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        specialization = Specialization.objects.create(name='Cardiology')
+        self.doctor = create_doctor('doctor', specialization)
+        self.other = create_doctor('other', specialization)
+        self.patient = CustomUser.objects.create_user(username='patient', password='password123')
+        self.day = next_monday()
+        self.appointments = [self.create(self.doctor, hour) for hour in (9, 10)]
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(username='admin', password='password123', user_type='admin'))
+
+    def create(self, doctor, hour):
+        return Appointment.objects.create(patient=self.patient, doctor=doctor, appointment_date=self.day, appointment_time=time(hour))
+
+    def cancel(self, **data):
+        data = dict({'doctor': self.doctor.id, 'start': self.day, 'end': self.day}, **data)
+        return self.client.post('/api/appointments/bulk/cancel/', data, format='json')
+
+    def test_cancel(self):
+        response = self.cancel()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data['results'],
+            [{'id': appointment.id, 'status': 'cancelled'} for appointment in self.appointments]
+        )
+        self.assertFalse(Appointment.objects.filter(status__in=['pending', 'confirmed']).exists())
+
+    def test_reassign_skips_taken_slots(self):
+        self.create(self.other, 9)
+        response = self.cancel(reassign_to=self.other.id)
+        self.assertEqual(response.status_code, 200)
+        first, second = response.data['results']
+        self.assertEqual(first['status'], 'error')
+        self.assertEqual(second, {'id': self.appointments[1].id, 'status': 'reassigned', 'doctor': self.other.id})
+        doctors = dict(Appointment.objects.filter(id__in=[a.id for a in self.appointments]).values_list('id', 'doctor_id'))
+        self.assertEqual(doctors, {self.appointments[0].id: self.doctor.id, self.appointments[1].id: self.other.id})
+
+    def test_reassign_into_a_concurrent_booking_is_a_conflict(self):
+        self.create(self.other, 9)
+        # As if the other doctor's 09:00 booking landed after the schedule check
+        with mock.patch.object(services, 'check_slot'):
+            response = self.cancel(reassign_to=self.other.id)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Appointment.objects.filter(doctor=self.doctor).count(), 2)
+
+
+class AppointmentQueryCountTests(TestCase):
+    """Role checks read ids from the user, whether a token-backed ClaimsUser or a CustomUser."""
+
+    def setUp(self):
+        cache.clear()
+        self.doctor = create_doctor('doctor', Specialization.objects.create(name='Cardiology'))
+        self.patient = CustomUser.objects.create_user(username='patient', password='password123')
+        for hour in (9, 10):
+            Appointment.objects.create(
+                patient=self.patient, doctor=self.doctor, appointment_date=next_monday(), appointment_time=time(hour)
+            )
+
+    def clients(self, user):
+        # A ClaimsUser from the access token's claims, then a CustomUser with its doctor profile loaded
+        claims_client = APIClient()
+        claims_client.credentials(HTTP_AUTHORIZATION=f'Bearer {UserRefreshToken.for_user(user).access_token}')
+        model_client = APIClient()
+        model_client.force_authenticate(CustomUser.objects.select_related('doctor_profile').get(id=user.id))
+        return {'ClaimsUser': claims_client, 'CustomUser': model_client}
+
+    def test_doctor_list_is_one_query(self):
+        for kind, client in self.clients(self.doctor.user).items():
+            with self.subTest(kind), self.assertNumQueries(1):
+                response = client.get('/api/appointments/')
+            self.assertEqual(len(response.data['results']), 2)
+
+    def test_cancel_is_one_select_and_one_update(self):
+        appointments = iter(list(Appointment.objects.values_list('id', flat=True)))
+        for kind, client in self.clients(self.patient).items():
+            with self.subTest(kind), CaptureQueriesContext(connection) as queries:
+                response = client.post(f'/api/appointments/{next(appointments)}/cancel/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([query['sql'].split()[0] for query in queries], ['SELECT', 'UPDATE'])
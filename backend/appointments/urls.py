@@ -1,9 +1,21 @@
 from django.urls import path
-from .views import AppointmentListView, AppointmentDetailView, cancel_appointment, available_slots
+from .views import (
+    AppointmentListView, AppointmentDetailView, cancel_appointment, available_slots, available_slots_range,
+    first_available_slots, bulk_create_appointments, bulk_cancel_appointments_view
+)
+from . import async_views
 
 urlpatterns = [
     path('appointments/', AppointmentListView.as_view(), name='appointment-list'),
+    path('appointments/bulk/', bulk_create_appointments, name='appointment-bulk-create'),
+    path('appointments/bulk/cancel/', bulk_cancel_appointments_view, name='appointment-bulk-cancel'),
     path('appointments/<int:pk>/', AppointmentDetailView.as_view(), name='appointment-detail'),
     path('appointments/<int:appointment_id>/cancel/', cancel_appointment, name='cancel-appointment'),
     path('doctors/<int:doctor_id>/available-slots/', available_slots, name='available-slots'),
+    path('doctors/<int:doctor_id>/available-slots/range/', available_slots_range, name='available-slots-range'),
+    path('specializations/<int:specialization_id>/first-available/', first_available_slots, name='first-available-slots'),
+    
+    # Async variants
+    path('async/doctors/available-slots/', async_views.available_slots_many, name='async-available-slots-many'),
+    path('async/doctors/<int:doctor_id>/available-slots/', async_views.available_slots, name='async-available-slots'),
 ]
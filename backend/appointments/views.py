@@ -1,31 +1,66 @@
 from rest_framework import generics, permissions, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.shortcuts import get_object_or_404
 from .models import Appointment
-from .serializers import AppointmentSerializer, AppointmentCreateSerializer, AppointmentUpdateSerializer
-from datetime import date, timedelta, datetime
+from .serializers import (
+    AppointmentSerializer, AppointmentListSerializer, AppointmentCreateSerializer, AppointmentUpdateSerializer,
+    BulkAppointmentItemSerializer, BulkCancelSerializer
+)
+from datetime import date, timedelta
 from doctors.models import Doctor
+from users.models import CustomUser
+from doctors.serializers import DoctorListSerializer
+from appointment_system.pagination import AppointmentCursorPagination
+from appointment_system import metrics
+from appointment_system.routers import use_replica
+from .permissions import ADMIN, appointments_for, can_book, can_cancel, can_bulk_cancel
+from .services import book_appointment, update_appointment, bulk_book_appointments, bulk_cancel_appointments
+from .slots import (
+    free_slots, cached_free_slots, free_slots_for_range, first_free_slots, format_slot,
+    sync_cached_slot, update_cached_slot, ACTIVE_STATUSES, MAX_RANGE_DAYS
+)
+
+# Related rows rendered by the appointment serializers
+APPOINTMENT_RELATED = ('patient', 'doctor__user', 'doctor__specialization')
+
+# Upper bound on ?limit= for the first-available search
+MAX_FIRST_AVAILABLE = 50
+
+# Most appointments a single bulk booking request may carry
+MAX_BULK_ITEMS = 200
 
 class AppointmentListView(generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = AppointmentCursorPagination
+    
+    def expand_doctor(self):
+        # ?expand=doctor opts into the full nested doctor representation
+        return self.request.query_params.get('expand') == 'doctor'
     
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'doctor':
-            return Appointment.objects.filter(doctor__user=user)
-        elif user.user_type == 'admin':
-            return Appointment.objects.all()
-        else:
-            return Appointment.objects.filter(patient=user)
+        queryset = appointments_for(self.request.user).select_related(*APPOINTMENT_RELATED)
+        if self.expand_doctor():
+            queryset = queryset.prefetch_related('doctor__availabilities')
+        return queryset
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return AppointmentCreateSerializer
-        return AppointmentSerializer
+        if self.expand_doctor():
+            return AppointmentSerializer
+        return AppointmentListSerializer
     
     def perform_create(self, serializer):
-        serializer.save(patient=self.request.user)
+        if not can_book(self.request.user):
+            raise PermissionDenied()
+        try:
+            serializer.instance = book_appointment(patient_id=self.request.user.id, **serializer.validated_data)
+        except DjangoValidationError as e:
+            raise ValidationError(e.messages)
 
 class AppointmentDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Appointment.objects.all()
@@ -33,37 +68,116 @@ class AppointmentDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'doctor':
-            return Appointment.objects.filter(doctor__user=user)
-        elif user.user_type == 'admin':
-            return Appointment.objects.all()
-        else:
-            return Appointment.objects.filter(patient=user)
+        return appointments_for(self.request.user).select_related(*APPOINTMENT_RELATED).prefetch_related('doctor__availabilities')
+    
+    def perform_update(self, serializer):
+        try:
+            serializer.instance = update_appointment(serializer.instance, **serializer.validated_data)
+        except DjangoValidationError as e:
+            raise ValidationError(e.messages)
+    
+    def perform_destroy(self, instance):
+        instance.delete()
+        if instance.status in ACTIVE_STATUSES:
+            update_cached_slot(
+                instance.doctor_id, instance.appointment_date, instance.appointment_time, instance.duration_minutes,
+                booked=False
+            )
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def cancel_appointment(request, appointment_id):
     appointment = get_object_or_404(Appointment, id=appointment_id)
     
-    # Check if user has permission to cancel this appointment
-    user = request.user
-    if user.user_type not in ['admin', 'doctor'] and appointment.patient != user:
+    if not can_cancel(request.user, appointment):
         return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
     
     if appointment.status in ['cancelled', 'completed']:
         return Response({'error': 'Cannot cancel this appointment'}, status=status.HTTP_400_BAD_REQUEST)
     
     appointment.status = 'cancelled'
-    appointment.save()
+    appointment.save(update_fields=['status', 'updated_at'])
+    sync_cached_slot(appointment)
+    metrics.CANCELLATIONS.inc()
     
     return Response({'message': 'Appointment cancelled successfully'})
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_create_appointments(request):
+    user = request.user
+    if not can_book(user):
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    items = request.data.get('appointments')
+    if not isinstance(items, list) or not items:
+        return Response({'error': 'appointments must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > MAX_BULK_ITEMS:
+        return Response({'error': f'Cannot book more than {MAX_BULK_ITEMS} appointments at once'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    serializer = BulkAppointmentItemSerializer(data=items, many=True)
+    serializer.is_valid(raise_exception=True)
+    items = serializer.validated_data
+    
+    # Admins book on behalf of patients; patients book for themselves
+    doctors = Doctor.objects.select_related('specialization').in_bulk({item['doctor'] for item in items})
+    if user.user_type == ADMIN:
+        patient_ids = set(CustomUser.objects.filter(
+            id__in={item['patient'] for item in items if 'patient' in item}
+        ).values_list('id', flat=True))
+    
+    results = [None] * len(items)
+    bookable, positions = [], []
+    for index, item in enumerate(items):
+        if user.user_type == ADMIN:
+            patient_id = item.pop('patient', None)
+            patient_id = patient_id if patient_id in patient_ids else None
+        else:
+            item.pop('patient', None)
+            patient_id = user.id
+        doctor = doctors.get(item['doctor'])
+        if patient_id is None or doctor is None:
+            results[index] = {'index': index, 'status': 'error', 'error': 'Unknown patient' if patient_id is None else 'Unknown doctor'}
+            continue
+        bookable.append(dict(item, patient_id=patient_id, doctor=doctor))
+        positions.append(index)
+    
+    for index, result in zip(positions, bulk_book_appointments(bookable)):
+        results[index] = dict(result, index=index)
+    
+    return Response({
+        'created': sum(result['status'] == 'created' for result in results),
+        'results': results
+    })
+
+@api_view(['POST'])
+@authentication_classes([JWTAuthentication])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_cancel_appointments_view(request):
+    serializer = BulkCancelSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+    
+    if (data['end'] - data['start']).days >= MAX_RANGE_DAYS:
+        return Response({'error': f'Date range cannot exceed {MAX_RANGE_DAYS} days'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    doctors = Doctor.objects.select_related('specialization').in_bulk({data['doctor'], data.get('reassign_to', data['doctor'])})
+    doctor = doctors.get(data['doctor'])
+    reassign_to = doctors.get(data['reassign_to']) if 'reassign_to' in data else None
+    if doctor is None or ('reassign_to' in data and reassign_to is None):
+        return Response({'error': 'Doctor not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    if not can_bulk_cancel(request.user, doctor, reassign_to):
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    results = bulk_cancel_appointments(doctor, data['start'], data['end'], reassign_to=reassign_to)
+    return Response({'results': results})
+
+@use_replica
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def available_slots(request, doctor_id):
     
-    doctor = get_object_or_404(Doctor, id=doctor_id)
     requested_date = request.GET.get('date', date.today().isoformat())
     
     try:
@@ -71,35 +185,72 @@ def available_slots(request, doctor_id):
     except ValueError:
         return Response({'error': 'Invalid date format'}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Get doctor's availability for the requested day
-    day_name = requested_date.strftime('%A').lower()
+    # Entries are only written once the doctor below exists, so a hit needs no lookup
+    slots = cached_free_slots(doctor_id, requested_date)
+    if slots is None:
+        doctor = get_object_or_404(Doctor.objects.select_related('specialization'), id=doctor_id)
+        slots = free_slots(doctor, requested_date)
+    return Response({'available_slots': [format_slot(minute) for minute in slots]})
+
+def _parse_date_range(request, default_days):
+    # Returns (start, end, error_response) for ?start=&end= query parameters
     try:
-        availability = doctor.availabilities.get(day=day_name)
-        if not availability.is_available:
-            return Response({'available_slots': []})
-    except:
-        return Response({'available_slots': []})
-    
-    # Generate time slots
-    start_time = availability.start_time
-    end_time = availability.end_time
-    
-    # 30-minute slots
-    slot_duration = timedelta(minutes=30)
-    current_time = start_time
-    
-    available_slots = []
-    while current_time < end_time:
-        slot_time = current_time
-        current_time = (datetime.combine(date.min, current_time) + slot_duration).time()
-        
-        # Check if slot is already booked
-        if not Appointment.objects.filter(
-            doctor=doctor,
-            appointment_date=requested_date,
-            appointment_time=slot_time,
-            status__in=['pending', 'confirmed']
-        ).exists():
-            available_slots.append(slot_time.strftime('%H:%M'))
-    
-    return Response({'available_slots': available_slots})
+        start = date.fromisoformat(request.GET.get('start', date.today().isoformat()))
+        end = request.GET.get('end')
+        end = date.fromisoformat(end) if end else start + timedelta(days=default_days - 1)
+    except ValueError:
+        return None, None, Response({'error': 'Invalid date format'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if end < start:
+        return None, None, Response({'error': 'End date must not be before start date'}, status=status.HTTP_400_BAD_REQUEST)
+    if (end - start).days >= MAX_RANGE_DAYS:
+        return None, None, Response({'error': f'Date range cannot exceed {MAX_RANGE_DAYS} days'}, status=status.HTTP_400_BAD_REQUEST)
+    return start, end, None
+
+@use_replica
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def available_slots_range(request, doctor_id):
+    
+    doctor = get_object_or_404(Doctor.objects.select_related('specialization'), id=doctor_id)
+    start, end, error = _parse_date_range(request, default_days=7)
+    if error:
+        return error
+    
+    slots = free_slots_for_range(doctor, start, end)
+    return Response({
+        'available_slots': {
+            day.isoformat(): [format_slot(minute) for minute in minutes]
+            for day, minutes in slots.items()
+        }
+    })
+
+@use_replica
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def first_available_slots(request, specialization_id):
+    
+    start, end, error = _parse_date_range(request, default_days=14)
+    if error:
+        return error
+    
+    try:
+        limit = int(request.GET.get('limit', 10))
+    except ValueError:
+        return Response({'error': 'Invalid limit'}, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(limit, MAX_FIRST_AVAILABLE))
+    
+    doctors = Doctor.objects.filter(specialization_id=specialization_id, is_available=True)
+    slots = first_free_slots(doctors, start, end, limit)
+    
+    doctor_ids = {doctor_id for _, _, doctor_id in slots}
+    serialized = {
+        doctor.id: DoctorListSerializer(doctor).data
+        for doctor in doctors.filter(id__in=doctor_ids).select_related('user', 'specialization')
+    }
+    return Response({
+        'slots': [
+            {'date': day.isoformat(), 'time': format_slot(minute), 'doctor': serialized[doctor_id]}
+            for day, minute, doctor_id in slots
+        ]
+    })
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Doctor, Specialization, DoctorAvailability
+from .models import Doctor, Specialization, DoctorAvailability, AvailabilityOverride
 
 @admin.register(Specialization)
 class SpecializationAdmin(admin.ModelAdmin):
@@ -17,3 +17,10 @@ class DoctorAvailabilityAdmin(admin.ModelAdmin):
     list_display = ['doctor', 'day', 'start_time', 'end_time', 'is_available']
     list_filter = ['day', 'is_available']
     search_fields = ['doctor__user__username']
+
+@admin.register(AvailabilityOverride)
+class AvailabilityOverrideAdmin(admin.ModelAdmin):
+    list_display = ['doctor', 'date', 'start_time', 'end_time', 'is_available', 'reason']
+    list_filter = ['is_available', 'date']
+    search_fields = ['doctor__user__username', 'reason']
+    date_hierarchy = 'date'
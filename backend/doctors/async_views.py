@@ -0,0 +1,55 @@
+"""
+Async variants of the public directory endpoints, served under /api/async/.
+
+DRF views are sync-only, so these are plain Django async views returning
+JsonResponse. They share the directory cache and serializers with the DRF
+views; the doctor list pages by id with ``?after=`` instead of DRF cursors.
+"""
+from django.conf import settings
+from django.http import HttpResponseNotAllowed, JsonResponse
+from appointment_system.routers import use_replica
+from .cache import acached_json, DOCTORS_SCOPE, SPECIALIZATIONS_SCOPE
+from .models import Doctor, Specialization
+from .serializers import DoctorListSerializer, SpecializationSerializer
+from .views import LIST_RELATED
+
+
+@use_replica
+async def doctor_list(request):
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    try:
+        after = int(request.GET.get('after', 0))
+        page_size = int(request.GET.get('page_size', settings.PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid pagination parameters'}, status=400)
+    page_size = max(1, min(page_size, settings.MAX_PAGE_SIZE))
+
+    async def build():
+        doctors = [
+            doctor async for doctor in Doctor.objects.filter(
+                is_available=True, id__gt=after
+            ).select_related(*LIST_RELATED).order_by('id')[:page_size + 1]
+        ]
+        next_url = None
+        if len(doctors) > page_size:
+            next_url = request.build_absolute_uri(f'{request.path}?after={doctors[page_size - 1].id}&page_size={page_size}')
+        return {
+            'next': next_url,
+            'results': DoctorListSerializer(doctors[:page_size], many=True).data
+        }
+
+    return await acached_json(request, [DOCTORS_SCOPE], build)
+
+
+@use_replica
+async def specialization_list(request):
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    async def build():
+        specializations = [specialization async for specialization in Specialization.objects.all()]
+        return SpecializationSerializer(specializations, many=True).data
+
+    return await acached_json(request, [SPECIALIZATIONS_SCOPE], build)
@@ -0,0 +1,144 @@
+"""
+Read-through cache for the public doctor directory.
+
+Cached responses are keyed by one or more generation tokens ("scopes"). Signal
+handlers in doctors.signals replace a scope's token when its data changes,
+which orphans every entry built under the old token.
+"""
+import hashlib
+import json
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponseNotModified, JsonResponse
+from django.utils.http import http_date, parse_http_date_safe, parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from appointment_system.routers import replica_reads
+
+# Scope covering every list payload (DoctorListView, doctors_by_specialization)
+DOCTORS_SCOPE = 'doctors'
+SPECIALIZATIONS_SCOPE = 'specializations'
+
+
+def doctor_scope(doctor_id):
+    # Scope covering a single doctor's detail payload
+    return f'doctor:{doctor_id}'
+
+
+def _generation_key(scope):
+    return f'directory:gen:{scope}'
+
+
+def _generations(scopes):
+    # Returns the scopes' tokens and the keys of the ones this call created
+    keys = [_generation_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return [found[key] for key in keys], list(missing)
+
+
+async def _agenerations(scopes):
+    keys = [_generation_key(scope) for scope in scopes]
+    found = await cache.aget_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in found}
+    if missing:
+        await cache.aset_many(missing, None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def invalidate(*scopes):
+    """Orphan every cached response built under any of ``scopes``."""
+    cache.set_many({_generation_key(scope): uuid.uuid4().hex for scope in scopes}, None)
+
+
+def _not_modified(request, entry):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or entry['etag'] in etags
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and int(entry['last_modified']) <= if_modified_since
+
+
+def _entry_key(request, generations):
+    path_hash = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return 'directory:' + ':'.join(generations) + ':' + path_hash
+
+
+def _make_entry(data):
+    payload = json.dumps(data, sort_keys=True, default=str).encode()
+    return {
+        'data': data,
+        'etag': '"%s"' % hashlib.md5(payload).hexdigest(),
+        'last_modified': time.time(),
+    }
+
+
+def _validators(entry):
+    return {'ETag': entry['etag'], 'Last-Modified': http_date(entry['last_modified'])}
+
+
+def cached_response(request, scopes, build):
+    """Serve ``build()``'s response data from the cache with ETag/Last-Modified validators.
+
+    Only 200 responses are cached. ``build`` is called on a miss and must return a DRF Response.
+    """
+    generations, created = _generations(scopes)
+    key = _entry_key(request, generations)
+
+    entry = cache.get(key)
+    if entry is None:
+        # Build from the primary: a lagging replica would put pre-write data back
+        # into the cache, where no later invalidation would clear it
+        # Don't keep tokens for scopes that turned out not to exist, such as a missing doctor's
+        try:
+            with replica_reads(False):
+                response = build()
+        except Exception:
+            cache.delete_many(created)
+            raise
+        if response.status_code != status.HTTP_200_OK:
+            cache.delete_many(created)
+            return response
+        entry = _make_entry(response.data)
+        cache.set(key, entry, settings.DIRECTORY_CACHE_TIMEOUT)
+
+    headers = _validators(entry)
+    if _not_modified(request, entry):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(entry['data'], headers=headers)
+
+
+async def acached_json(request, scopes, build):
+    """cached_response() for plain async views.
+
+    ``build`` is a coroutine function returning the JSON-serializable payload.
+    """
+    key = _entry_key(request, await _agenerations(scopes))
+
+    entry = await cache.aget(key)
+    if entry is None:
+        with replica_reads(False):
+            entry = _make_entry(await build())
+        await cache.aset(key, entry, settings.DIRECTORY_CACHE_TIMEOUT)
+
+    headers = _validators(entry)
+    if _not_modified(request, entry):
+        return HttpResponseNotModified(headers=headers)
+    return JsonResponse(entry['data'], safe=False, headers=headers)
+
+
+class DirectoryCacheMixin:
+    """Serves a generic view's GET through cached_response()."""
+
+    def get_cache_scopes(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        return cached_response(request, self.get_cache_scopes(), lambda: super(DirectoryCacheMixin, self).get(request, *args, **kwargs))
@@ -0,0 +1,117 @@
+"""
+Materialized per-doctor schedule calendar.
+
+A doctor's working intervals on a date come from their weekly DoctorAvailability
+rows, unless AvailabilityOverride rows exist for that date, in which case the
+available overrides replace them. ScheduleBlock stores the result from today
+through ``Doctor.calendar_until`` so reads are an indexed range scan; dates
+outside that window are derived on the fly.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from .models import Doctor, DoctorAvailability, AvailabilityOverride, ScheduleBlock
+
+# Sent with ``doctor_ids`` after their calendar rows were rebuilt
+calendar_refreshed = Signal()
+
+
+def calendar_horizon():
+    today = timezone.now().date()
+    return today, today + timedelta(weeks=settings.SCHEDULE_CALENDAR_WEEKS, days=-1)
+
+
+def merge_intervals(intervals):
+    """Sorted (start_time, end_time) intervals with overlapping ones joined."""
+    merged = []
+    for start_time, end_time in sorted(intervals):
+        if merged and start_time < merged[-1][1]:
+            if end_time > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end_time)
+        else:
+            merged.append((start_time, end_time))
+    return merged
+
+
+def derive_intervals(doctor_ids, start, end):
+    """Working (start_time, end_time) intervals keyed by (doctor_id, date), from the source rows.
+
+    Overlapping rows are merged, so each minute of a day is in at most one interval.
+    """
+    weekly = {}
+    for row in DoctorAvailability.objects.filter(doctor_id__in=doctor_ids, is_available=True).order_by('start_time'):
+        weekly.setdefault((row.doctor_id, row.day), []).append((row.start_time, row.end_time))
+
+    overrides = {}
+    for row in AvailabilityOverride.objects.filter(doctor_id__in=doctor_ids, date__range=(start, end)).order_by('start_time'):
+        # A date with only closures still gets an (empty) entry
+        intervals = overrides.setdefault((row.doctor_id, row.date), [])
+        if row.is_available:
+            intervals.append((row.start_time, row.end_time))
+
+    result = {}
+    day = start
+    while day <= end:
+        day_name = day.strftime('%A').lower()
+        for doctor_id in doctor_ids:
+            intervals = overrides.get((doctor_id, day), weekly.get((doctor_id, day_name)))
+            if intervals:
+                result[doctor_id, day] = merge_intervals(intervals)
+        day += timedelta(days=1)
+    return result
+
+
+def intervals_for(doctors, start, end):
+    """Working intervals keyed by (doctor_id, date) for Doctor instances between two dates."""
+    today = timezone.now().date()
+    doctors = {doctor.id: doctor for doctor in doctors}
+
+    def covered(doctor_id, day):
+        until = doctors[doctor_id].calendar_until
+        return until is not None and today <= day <= until
+
+    result = {}
+    first_covered = max(start, today)
+    covered_ids = [
+        doctor.id for doctor in doctors.values()
+        if doctor.calendar_until and doctor.calendar_until >= first_covered
+    ]
+    if covered_ids and first_covered <= end:
+        blocks = ScheduleBlock.objects.filter(
+            doctor_id__in=covered_ids, date__range=(first_covered, end)
+        ).values_list('doctor_id', 'date', 'start_time', 'end_time')
+        for doctor_id, day, start_time, end_time in blocks:
+            if covered(doctor_id, day):
+                result.setdefault((doctor_id, day), []).append((start_time, end_time))
+
+    uncovered_ids = [
+        doctor.id for doctor in doctors.values()
+        if not (doctor.calendar_until and today <= start and end <= doctor.calendar_until)
+    ]
+    if uncovered_ids:
+        for (doctor_id, day), intervals in derive_intervals(uncovered_ids, start, end).items():
+            if not covered(doctor_id, day):
+                result[doctor_id, day] = intervals
+    return result
+
+
+def refresh_calendar(doctor_ids):
+    """Rebuild the materialized calendar of ``doctor_ids`` from today through the horizon."""
+    doctor_ids = list(Doctor.objects.filter(id__in=list(doctor_ids)).values_list('id', flat=True))
+    if not doctor_ids:
+        return
+    start, end = calendar_horizon()
+    intervals = derive_intervals(doctor_ids, start, end)
+
+    with transaction.atomic():
+        ScheduleBlock.objects.filter(doctor_id__in=doctor_ids).delete()
+        ScheduleBlock.objects.bulk_create([
+            ScheduleBlock(doctor_id=doctor_id, date=day, start_time=start_time, end_time=end_time)
+            for (doctor_id, day), rows in intervals.items()
+            for start_time, end_time in rows
+        ], batch_size=1000)
+        Doctor.objects.filter(id__in=doctor_ids).update(calendar_until=end)
+
+    calendar_refreshed.send(sender=Doctor, doctor_ids=doctor_ids)
@@ -0,0 +1,64 @@
+"""
+Seed a large scratch directory and time the first-page query of doctor
+searches: full-text (FTS5 on SQLite, GIN on Postgres) against the LIKE
+fallback, plus range filters and sorting served by the composite indexes.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.http import QueryDict
+from appointment_system.benchmarks import scratch_database, measure, seed
+from appointment_system.pagination import DoctorCursorPagination
+from doctors.models import Doctor
+from doctors.search import filter_doctors, like_search, search_terms
+from doctors.views import LIST_RELATED
+
+SEARCHES = [
+    'q=smith',
+    'q=card',
+    'q=mary garcia',
+    'q=yuki haddad dermatology',
+    'q=migraine neuro',
+    'q=patel&ordering=fee',
+    'min_fee=100&max_fee=150&ordering=fee',
+    'min_experience=30&ordering=-experience',
+    'q=pediatrics&min_fee=50&max_fee=120&min_experience=10&ordering=-fee',
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark directory search, filtering and sorting on a large seeded database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=50000)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--explain', action='store_true', help='Print each query plan')
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.stdout.write(f'Seeding {options["doctors"]} doctors...')
+            seed(options['doctors'], patients=10, appointments=0)
+
+            base = Doctor.objects.filter(is_available=True).select_related(*LIST_RELATED)
+            self.stdout.write(f'{"search":<70} {"indexed p50":>12} {"p99":>8} {"LIKE p50":>10}  rows')
+            for search in SEARCHES:
+                params = QueryDict(search)
+                ordering = DoctorCursorPagination.orderings.get(params.get('ordering'), DoctorCursorPagination.ordering)
+
+                def page(queryset):
+                    return lambda: list(queryset.order_by(*ordering)[:settings.PAGE_SIZE + 1])
+
+                indexed = filter_doctors(base, params)
+                stats = measure(page(indexed), options['repeat'])
+                line = f'{search:<70} {stats["p50"]:9.2f} ms {stats["p99"]:8.2f}'
+                if params.get('q'):
+                    # The same search with the text match as a LIKE scan
+                    without_q = params.copy()
+                    del without_q['q']
+                    like = like_search(filter_doctors(base, without_q), search_terms(params['q']))
+                    line += f' {measure(page(like), options["repeat"])["p50"]:7.2f} ms'
+                else:
+                    line += f' {"-":>10}'
+                self.stdout.write(f'{line}  {len(page(indexed)())}')
+                if options['explain']:
+                    for plan_line in indexed.order_by(*ordering)[:settings.PAGE_SIZE + 1].explain().splitlines():
+                        self.stdout.write(f'    {plan_line}')
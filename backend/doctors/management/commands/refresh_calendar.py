@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from doctors.calendar import refresh_calendar, calendar_horizon
+from doctors.models import Doctor
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized schedule calendar; run daily to roll the window forward'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        doctor_ids = list(Doctor.objects.order_by('id').values_list('id', flat=True))
+        batch_size = options['batch_size']
+        for offset in range(0, len(doctor_ids), batch_size):
+            refresh_calendar(doctor_ids[offset:offset + batch_size])
+        start, end = calendar_horizon()
+        self.stdout.write(f'Refreshed {len(doctor_ids)} doctor calendars for {start} to {end}')
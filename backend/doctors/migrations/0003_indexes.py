@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='doctor',
+            index=models.Index(fields=['specialization', 'is_available'], name='doctor_spec_available_idx'),
+        ),
+    ]
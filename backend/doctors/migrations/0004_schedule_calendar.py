@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0003_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='calendar_until',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='doctoravailability',
+            unique_together={('doctor', 'day', 'start_time')},
+        ),
+        migrations.CreateModel(
+            name='ScheduleBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedule_blocks', to='doctors.doctor')),
+            ],
+            options={
+                'ordering': ['date', 'start_time'],
+                'indexes': [models.Index(fields=['doctor', 'date'], name='schedule_doctor_date_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AvailabilityOverride',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('start_time', models.TimeField(blank=True, null=True)),
+                ('end_time', models.TimeField(blank=True, null=True)),
+                ('is_available', models.BooleanField(default=False)),
+                ('reason', models.CharField(blank=True, max_length=200)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_overrides', to='doctors.doctor')),
+            ],
+            options={
+                'verbose_name': 'Availability Override',
+                'verbose_name_plural': 'Availability Overrides',
+                'ordering': ['date', 'start_time'],
+                'indexes': [models.Index(fields=['doctor', 'date'], name='override_doctor_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:26
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0004_schedule_calendar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='buffer_minutes',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='slot_minutes',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(5)]),
+        ),
+        migrations.AddField(
+            model_name='specialization',
+            name='slot_minutes',
+            field=models.PositiveSmallIntegerField(default=30, validators=[django.core.validators.MinValueValidator(5)]),
+        ),
+    ]
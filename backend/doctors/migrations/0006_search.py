@@ -0,0 +1,76 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:47
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Concat
+
+
+def fill_search_documents(apps, schema_editor):
+    Doctor = apps.get_model('doctors', 'Doctor')
+    CustomUser = apps.get_model('users', 'CustomUser')
+    Specialization = apps.get_model('doctors', 'Specialization')
+    user = CustomUser.objects.filter(pk=OuterRef('user_id'))
+    specialization = Specialization.objects.filter(pk=OuterRef('specialization_id'))
+    Doctor.objects.using(schema_editor.connection.alias).update(search_document=Concat(
+        Subquery(user.values('first_name')), Value(' '),
+        Subquery(user.values('last_name')), Value(' '),
+        Subquery(specialization.values('name')), Value(' '),
+        'bio',
+        output_field=TextField(),
+    ))
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        # Skipped on SQLite builds without FTS5; doctors.search falls back to LIKE
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute('PRAGMA compile_options')
+            if ('ENABLE_FTS5',) not in cursor.fetchall():
+                return
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE doctors_doctor_search USING fts5("
+            "search_document, tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            'INSERT INTO doctors_doctor_search(rowid, search_document) SELECT id, search_document FROM doctors_doctor'
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE INDEX doctor_search_document_idx ON doctors_doctor "
+            "USING gin (to_tsvector('simple', search_document))"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS doctors_doctor_search')
+    elif vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS doctor_search_document_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0005_slot_length'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='search_document',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='doctor',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['consultation_fee', 'id'], name='doctor_available_fee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctor',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['experience_years', 'id'], name='doctor_available_exp_idx'),
+        ),
+        migrations.RunPython(fill_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
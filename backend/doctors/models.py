@@ -1,9 +1,13 @@
+from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator
 from django.db import models
 from users.models import CustomUser
 
 class Specialization(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
+    # Default appointment length for doctors who don't set their own
+    slot_minutes = models.PositiveSmallIntegerField(default=30, validators=[MinValueValidator(5)])
     
     def __str__(self):
         return self.name
@@ -20,6 +24,13 @@ class Doctor(models.Model):
     bio = models.TextField(blank=True)
     consultation_fee = models.DecimalField(max_digits=10, decimal_places=2)
     is_available = models.BooleanField(default=True)
+    # Appointment length, falling back to the specialization's, plus a gap left after each one
+    slot_minutes = models.PositiveSmallIntegerField(null=True, blank=True, validators=[MinValueValidator(5)])
+    buffer_minutes = models.PositiveSmallIntegerField(default=0)
+    # Last date covered by the materialized ScheduleBlock calendar
+    calendar_until = models.DateField(null=True, blank=True, editable=False)
+    # Name, specialization and bio for full-text search, maintained by doctors.search
+    search_document = models.TextField(blank=True, editable=False)
     
     def __str__(self):
         return f"Dr. {self.user.get_full_name()} - {self.specialization.name}"
@@ -27,6 +38,13 @@ class Doctor(models.Model):
     class Meta:
         verbose_name = 'Doctor'
         verbose_name_plural = 'Doctors'
+        indexes = [
+            models.Index(fields=['specialization', 'is_available'], name='doctor_spec_available_idx'),
+            # Range filters and ?ordering= on the directory, which only lists available doctors;
+            # id keeps the order total for cursors
+            models.Index(fields=['consultation_fee', 'id'], condition=models.Q(is_available=True), name='doctor_available_fee_idx'),
+            models.Index(fields=['experience_years', 'id'], condition=models.Q(is_available=True), name='doctor_available_exp_idx'),
+        ]
 
 class DoctorAvailability(models.Model):
     DAY_CHOICES = [
@@ -48,7 +66,65 @@ class DoctorAvailability(models.Model):
     def __str__(self):
         return f"{self.doctor.user.get_full_name()} - {self.get_day_display()} ({self.start_time} - {self.end_time})"
     
+    def clean(self):
+        if self.start_time and self.end_time and self.start_time >= self.end_time:
+            raise ValidationError("Start time must be before end time")
+        if not (self.is_available and self.doctor_id and self.start_time and self.end_time):
+            return
+        overlapping = DoctorAvailability.objects.filter(
+            doctor_id=self.doctor_id, day=self.day, is_available=True,
+            start_time__lt=self.end_time, end_time__gt=self.start_time
+        ).exclude(pk=self.pk)
+        if overlapping.exists():
+            raise ValidationError("This interval overlaps another availability on the same day")
+    
     class Meta:
         verbose_name = 'Doctor Availability'
         verbose_name_plural = 'Doctor Availabilities'
-        unique_together = ['doctor', 'day']
+        # Several rows per day express split shifts
+        unique_together = ['doctor', 'day', 'start_time']
+
+class AvailabilityOverride(models.Model):
+    """Replaces a doctor's weekly schedule on one date.
+
+    When a date has any overrides, its available overrides become that day's working
+    intervals; a date with only unavailable overrides is closed.
+    """
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='availability_overrides')
+    date = models.DateField()
+    start_time = models.TimeField(null=True, blank=True)
+    end_time = models.TimeField(null=True, blank=True)
+    is_available = models.BooleanField(default=False)
+    reason = models.CharField(max_length=200, blank=True)
+    
+    def __str__(self):
+        if not self.is_available:
+            return f"{self.doctor.user.get_full_name()} - closed {self.date}"
+        return f"{self.doctor.user.get_full_name()} - {self.date} ({self.start_time} - {self.end_time})"
+    
+    def clean(self):
+        if self.is_available and not (self.start_time and self.end_time):
+            raise ValidationError("Available overrides need a start and end time")
+        if self.start_time and self.end_time and self.start_time >= self.end_time:
+            raise ValidationError("Start time must be before end time")
+    
+    class Meta:
+        verbose_name = 'Availability Override'
+        verbose_name_plural = 'Availability Overrides'
+        ordering = ['date', 'start_time']
+        indexes = [
+            models.Index(fields=['doctor', 'date'], name='override_doctor_date_idx'),
+        ]
+
+class ScheduleBlock(models.Model):
+    """One working interval of a doctor's materialized calendar, maintained by doctors.calendar."""
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='schedule_blocks')
+    date = models.DateField()
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    
+    class Meta:
+        ordering = ['date', 'start_time']
+        indexes = [
+            models.Index(fields=['doctor', 'date'], name='schedule_doctor_date_idx'),
+        ]
@@ -0,0 +1,145 @@
+"""
+Server-side doctor search and filtering for the public directory.
+
+Each doctor's name, specialization and bio are denormalized into
+``Doctor.search_document`` by refresh_search_documents(), which doctors.signals
+calls whenever one of those changes. ``?q=`` is matched against that document
+through an FTS5 table on SQLite or a GIN full-text index on Postgres (both
+created by migration 0006), with a LIKE scan as the fallback on other backends
+or SQLite builds without FTS5. Every term is a prefix match, so "card" finds
+Cardiology.
+"""
+import re
+from decimal import Decimal, InvalidOperation
+from django.db import connections, router, transaction
+from django.db.models import BooleanField, OuterRef, Subquery, TextField, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Concat
+from users.models import CustomUser
+from .models import Doctor, Specialization
+
+FTS_TABLE = 'doctors_doctor_search'
+
+# Terms beyond this are ignored rather than growing the query without bound
+MAX_TERMS = 8
+
+# Query parameter -> (lookup, parser)
+RANGE_FILTERS = {
+    'min_fee': ('consultation_fee__gte', Decimal),
+    'max_fee': ('consultation_fee__lte', Decimal),
+    'min_experience': ('experience_years__gte', int),
+    'max_experience': ('experience_years__lte', int),
+}
+
+_fts_tables = {}
+
+
+class InvalidSearch(ValueError):
+    pass
+
+
+def search_terms(q):
+    return re.findall(r'\w+', q.lower())[:MAX_TERMS]
+
+
+def has_fts_table(using):
+    if using not in _fts_tables:
+        connection = connections[using]
+        _fts_tables[using] = connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+    return _fts_tables[using]
+
+
+def document_expression():
+    """The search document as an expression over a Doctor row: name, specialization and bio."""
+    user = CustomUser.objects.filter(pk=OuterRef('user_id'))
+    specialization = Specialization.objects.filter(pk=OuterRef('specialization_id'))
+    return Concat(
+        Subquery(user.values('first_name')), Value(' '),
+        Subquery(user.values('last_name')), Value(' '),
+        Subquery(specialization.values('name')), Value(' '),
+        'bio',
+        output_field=TextField(),
+    )
+
+
+def refresh_search_documents(doctor_ids=None):
+    """Rebuild the search document of ``doctor_ids`` (every doctor when None) in one UPDATE."""
+    doctors = Doctor.objects.all() if doctor_ids is None else Doctor.objects.filter(id__in=doctor_ids)
+    using = router.db_for_write(Doctor)
+    with transaction.atomic(using=using):
+        doctors.update(search_document=document_expression())
+        if not has_fts_table(using):
+            return
+        with connections[using].cursor() as cursor:
+            if doctor_ids is None:
+                cursor.execute(f'DELETE FROM {FTS_TABLE}')
+                cursor.execute(f'INSERT INTO {FTS_TABLE}(rowid, search_document) SELECT id, search_document FROM doctors_doctor')
+                return
+            doctor_ids = list(doctor_ids)
+            placeholders = ', '.join(['%s'] * len(doctor_ids))
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', doctor_ids)
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE}(rowid, search_document) '
+                f'SELECT id, search_document FROM doctors_doctor WHERE id IN ({placeholders})',
+                doctor_ids
+            )
+
+
+def remove_from_search_index(doctor_id):
+    using = router.db_for_write(Doctor)
+    if has_fts_table(using):
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [doctor_id])
+
+
+def like_search(queryset, terms):
+    for term in terms:
+        queryset = queryset.filter(search_document__icontains=term)
+    return queryset
+
+
+def search(queryset, q):
+    """Doctors in ``queryset`` whose search document contains every term of ``q`` as a prefix."""
+    terms = search_terms(q)
+    if not terms:
+        return queryset
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite' and has_fts_table(queryset.db):
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return queryset.filter(id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]))
+    if vendor == 'postgresql':
+        # Must match the indexed expression in migration 0006 exactly
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        return queryset.filter(RawSQL(
+            "to_tsvector('simple', doctors_doctor.search_document) @@ to_tsquery('simple', %s)",
+            [tsquery], output_field=BooleanField()
+        ))
+    return like_search(queryset, terms)
+
+
+def _parse(param, value, parser):
+    try:
+        number = parser(value)
+    except (ValueError, InvalidOperation):
+        raise InvalidSearch(f'{param} must be a number')
+    if isinstance(number, Decimal) and not number.is_finite():
+        raise InvalidSearch(f'{param} must be a number')
+    return number
+
+
+def filter_doctors(queryset, params):
+    """Apply the directory's ?q=, ?specialization= and fee/experience range parameters.
+
+    Raises InvalidSearch for malformed values. Sorting is the paginator's ?ordering=.
+    """
+    specialization = params.get('specialization')
+    if specialization:
+        queryset = queryset.filter(specialization_id=_parse('specialization', specialization, int))
+    for param, (lookup, parser) in RANGE_FILTERS.items():
+        value = params.get(param)
+        if value:
+            queryset = queryset.filter(**{lookup: _parse(param, value, parser)})
+    q = params.get('q')
+    if q:
+        queryset = search(queryset, q)
+    return queryset
@@ -19,7 +19,7 @@ class DoctorSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Doctor
-        fields = '__all__'
+        exclude = ['calendar_until', 'search_document']
 
 class DoctorListSerializer(serializers.ModelSerializer):
     user = UserProfileSerializer(read_only=True)
@@ -0,0 +1,57 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from users.models import CustomUser
+from .models import Doctor, Specialization, DoctorAvailability, AvailabilityOverride
+from .cache import invalidate, doctor_scope, DOCTORS_SCOPE, SPECIALIZATIONS_SCOPE
+from .calendar import refresh_calendar
+from .search import refresh_search_documents, remove_from_search_index
+
+# User fields that never appear in a directory payload
+IGNORED_USER_FIELDS = {'last_login', 'password'}
+
+# Doctor fields that feed the search document, besides the user's name
+SEARCH_FIELDS = {'user', 'specialization', 'bio'}
+
+
+@receiver([post_save, post_delete], sender=Doctor)
+def doctor_changed(sender, instance, signal, update_fields=None, **kwargs):
+    invalidate(doctor_scope(instance.id), DOCTORS_SCOPE)
+    if signal is post_delete:
+        remove_from_search_index(instance.id)
+    elif not update_fields or set(update_fields) & SEARCH_FIELDS:
+        refresh_search_documents([instance.id])
+
+
+@receiver([post_save, post_delete], sender=Specialization)
+def specialization_changed(sender, instance, signal, created=False, **kwargs):
+    doctor_ids = list(Doctor.objects.filter(specialization_id=instance.id).values_list('id', flat=True))
+    invalidate(SPECIALIZATIONS_SCOPE, DOCTORS_SCOPE, *(doctor_scope(doctor_id) for doctor_id in doctor_ids))
+    # A renamed specialization changes its doctors' search documents
+    if signal is post_save and not created and doctor_ids:
+        refresh_search_documents(doctor_ids)
+
+
+@receiver([post_save, post_delete], sender=DoctorAvailability)
+def availability_changed(sender, instance, **kwargs):
+    # Availabilities only appear in the detail payload
+    invalidate(doctor_scope(instance.doctor_id))
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def user_changed(sender, instance, signal, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= IGNORED_USER_FIELDS:
+        return
+    doctor_id = Doctor.objects.filter(user_id=instance.id).values_list('id', flat=True).first()
+    if doctor_id is not None:
+        invalidate(doctor_scope(doctor_id), DOCTORS_SCOPE)
+        if signal is post_save:
+            refresh_search_documents([doctor_id])
+
+
+@receiver([post_save, post_delete], sender=DoctorAvailability)
+@receiver([post_save, post_delete], sender=AvailabilityOverride)
+def schedule_changed(sender, instance, **kwargs):
+    # After commit, so a cascading doctor delete is not refreshed mid-transaction
+    doctor_id = instance.doctor_id
+    transaction.on_commit(lambda: refresh_calendar([doctor_id]))
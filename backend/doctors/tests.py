@@ -0,0 +1,252 @@
+from datetime import time, timedelta
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from users.models import CustomUser
+from appointments.tests import create_doctor, next_monday
+from .cache import _generation_key, doctor_scope
+from .calendar import intervals_for, refresh_calendar
+from .models import Doctor, DoctorAvailability, AvailabilityOverride, ScheduleBlock, Specialization
+from .search import FTS_TABLE, has_fts_table
+
+
+class DoctorQueryCountTests(TestCase):
+    """The directory and admin lists run a fixed number of queries however many doctors they return."""
+
+    def setUp(self):
+        self.specialization = Specialization.objects.create(name='Cardiology')
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(
+            username='admin', password='password123', user_type='admin'
+        ))
+
+    def add_doctors(self, count):
+        start = Doctor.objects.count()
+        for n in range(start, start + count):
+            user = CustomUser.objects.create_user(username=f'doctor{n}', password='password123', user_type='doctor')
+            doctor = Doctor.objects.create(
+                user=user, specialization=self.specialization, license_number=f'L{n}', consultation_fee=100
+            )
+            DoctorAvailability.objects.create(doctor=doctor, day='monday', start_time=time(9), end_time=time(12))
+
+    def count_queries(self, path):
+        # The directory is cached, so measure a cold request
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_doctors(self):
+        paths = [
+            '/api/doctors/',
+            '/api/admin/doctors/list/',
+            f'/api/doctors/specialization/{self.specialization.id}/',
+        ]
+        self.add_doctors(2)
+        with_two = {path: self.count_queries(path) for path in paths}
+        self.add_doctors(10)
+        with_twelve = {path: self.count_queries(path) for path in paths}
+        self.assertEqual(with_two, with_twelve)
+
+
+class ScheduleCalendarTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = create_doctor('doctor', Specialization.objects.create(name='Cardiology'))
+        self.availability = self.doctor.availabilities.get()
+        self.day = next_monday()
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(username='patient', password='password123'))
+
+    def intervals(self, start, end=None):
+        self.doctor.refresh_from_db()
+        return intervals_for([self.doctor], start, end or start)
+
+    def free_slots(self):
+        response = self.client.get(f'/api/doctors/{self.doctor.id}/available-slots/?date={self.day}')
+        return response.data['available_slots']
+
+    def test_overlapping_availability_is_rejected(self):
+        overlapping = DoctorAvailability(doctor=self.doctor, day='monday', start_time=time(11), end_time=time(15))
+        with self.assertRaises(ValidationError):
+            overlapping.full_clean()
+        DoctorAvailability(doctor=self.doctor, day='monday', start_time=time(12), end_time=time(15)).full_clean()
+
+    def test_overlapping_rows_are_merged(self):
+        DoctorAvailability.objects.create(doctor=self.doctor, day='monday', start_time=time(11), end_time=time(14))
+        self.assertEqual(self.intervals(self.day), {(self.doctor.id, self.day): [(time(9), time(14))]})
+        slots = self.free_slots()
+        self.assertEqual(len(slots), len(set(slots)))
+        self.assertEqual((slots[0], slots[-1]), ('09:00', '13:30'))
+
+    def test_day_off_override(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            AvailabilityOverride.objects.create(doctor=self.doctor, date=self.day, is_available=False)
+        self.assertEqual(self.intervals(self.day), {})
+        self.assertEqual(self.free_slots(), [])
+        # The rest of the weekly schedule is untouched
+        next_week = self.day + timedelta(weeks=1)
+        self.assertEqual(self.intervals(next_week), {(self.doctor.id, next_week): [(time(9), time(12))]})
+
+    def test_changed_hours_override(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            AvailabilityOverride.objects.create(
+                doctor=self.doctor, date=self.day, start_time=time(14), end_time=time(15), is_available=True
+            )
+        self.assertEqual(self.intervals(self.day), {(self.doctor.id, self.day): [(time(14), time(15))]})
+        self.assertEqual(self.free_slots(), ['14:00', '14:30'])
+
+    def test_availability_edit_refreshes_the_calendar(self):
+        refresh_calendar([self.doctor.id])
+        self.assertTrue(ScheduleBlock.objects.filter(doctor=self.doctor, date=self.day, end_time=time(12)).exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.availability.end_time = time(10)
+            self.availability.save()
+        blocks = ScheduleBlock.objects.filter(doctor=self.doctor, date=self.day)
+        self.assertEqual(list(blocks.values_list('start_time', 'end_time')), [(time(9), time(10))])
+        self.assertEqual(self.free_slots(), ['09:00', '09:30'])
+
+    def test_range_past_calendar_until(self):
+        refresh_calendar([self.doctor.id])
+        self.doctor.refresh_from_db()
+        until = self.doctor.calendar_until
+        # Change the weekly row without a refresh: covered dates keep the materialized
+        # hours and dates past calendar_until are derived from the new ones
+        DoctorAvailability.objects.filter(id=self.availability.id).update(end_time=time(10))
+        intervals = self.intervals(until - timedelta(days=6), until + timedelta(days=7))
+        mondays = sorted(day for _, day in intervals)
+        self.assertEqual(len(mondays), 2)
+        self.assertLessEqual(mondays[0], until)
+        self.assertGreater(mondays[1], until)
+        self.assertEqual(intervals[self.doctor.id, mondays[0]], [(time(9), time(12))])
+        self.assertEqual(intervals[self.doctor.id, mondays[1]], [(time(9), time(10))])
+
+
+class DoctorSearchTests(TestCase):
+    def setUp(self):
+        self.cardiology = Specialization.objects.create(name='Cardiology')
+        self.dermatology = Specialization.objects.create(name='Dermatology')
+        self.alice = self.create_doctor('alice', 'Alice', 'Smith', self.cardiology, fee=100, experience=5, bio='Heart rhythm')
+        self.bob = self.create_doctor('bob', 'Bob', 'Jones', self.dermatology, fee=200, experience=15)
+        self.client = APIClient()
+
+    def create_doctor(self, username, first_name, last_name, specialization, fee, experience, bio=''):
+        user = CustomUser.objects.create_user(
+            username=username, password='password123', user_type='doctor', first_name=first_name, last_name=last_name
+        )
+        return Doctor.objects.create(
+            user=user, specialization=specialization, license_number=username,
+            consultation_fee=fee, experience_years=experience, bio=bio
+        )
+
+    def found(self, **params):
+        cache.clear()
+        response = self.client.get('/api/doctors/', params)
+        self.assertEqual(response.status_code, 200)
+        return {doctor['id'] for doctor in response.data['results']}
+
+    def test_search(self):
+        self.assertEqual(self.found(q='card'), {self.alice.id})
+        self.assertEqual(self.found(q='smi'), {self.alice.id})
+        self.assertEqual(self.found(q='rhythm'), {self.alice.id})
+        self.assertEqual(self.found(q='bob derm'), {self.bob.id})
+        self.assertEqual(self.found(q='alice derm'), set())
+        self.assertEqual(self.found(q='  '), {self.alice.id, self.bob.id})
+
+    def test_search_uses_the_fts_index(self):
+        if not has_fts_table(connection.alias):
+            self.skipTest('SQLite built without FTS5')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.found(q='card'), {self.alice.id})
+        self.assertTrue(any(FTS_TABLE in query['sql'] for query in queries))
+
+    def test_doctor_bio_change_is_searchable(self):
+        self.bob.bio = 'Acne clinic'
+        self.bob.save()
+        self.assertEqual(self.found(q='acne'), {self.bob.id})
+
+    def test_user_rename_is_searchable(self):
+        self.bob.user.last_name = 'Cardenas'
+        self.bob.user.save()
+        self.assertEqual(self.found(q='cardenas'), {self.bob.id})
+        self.assertEqual(self.found(q='jones'), set())
+
+    def test_specialization_rename_is_searchable(self):
+        self.dermatology.name = 'Skin Care'
+        self.dermatology.save()
+        self.assertEqual(self.found(q='skin'), {self.bob.id})
+        self.assertEqual(self.found(q='dermatology'), set())
+
+    def test_deleted_doctor_leaves_the_index(self):
+        self.alice.delete()
+        self.assertEqual(self.found(q='card'), set())
+        if has_fts_table(connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(f'SELECT rowid FROM {FTS_TABLE}')
+                self.assertEqual([row[0] for row in cursor.fetchall()], [self.bob.id])
+
+    def test_range_filters(self):
+        self.assertEqual(self.found(min_fee='150'), {self.bob.id})
+        self.assertEqual(self.found(max_fee='100'), {self.alice.id})
+        self.assertEqual(self.found(min_experience='10'), {self.bob.id})
+        self.assertEqual(self.found(max_experience='10', q='alice'), {self.alice.id})
+        self.assertEqual(self.found(min_fee='150', max_experience='10'), set())
+
+    def test_invalid_filter(self):
+        for params in ({'min_fee': 'cheap'}, {'min_fee': 'NaN'}, {'max_experience': '1.5'}):
+            with self.subTest(params):
+                self.assertEqual(self.client.get('/api/doctors/', params).status_code, 400)
+
+
+class DirectoryCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = create_doctor('doctor', Specialization.objects.create(name='Cardiology'))
+        self.client = APIClient()
+        self.detail_url = f'/api/doctors/{self.doctor.id}/'
+
+    def test_etag_and_last_modified(self):
+        response = self.client.get('/api/doctors/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        response = self.client.get('/api/doctors/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        response = self.client.get('/api/doctors/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        # A change produces a new representation
+        self.doctor.consultation_fee = 150
+        self.doctor.save()
+        response = self.client.get('/api/doctors/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_doctor_change_invalidates_list_and_detail(self):
+        self.client.get('/api/doctors/')
+        self.client.get(self.detail_url)
+        self.doctor.consultation_fee = 150
+        self.doctor.save()
+        self.assertEqual(self.client.get('/api/doctors/').data['results'][0]['consultation_fee'], '150.00')
+        self.assertEqual(self.client.get(self.detail_url).data['consultation_fee'], '150.00')
+
+    def test_user_change_invalidates_the_list(self):
+        self.client.get('/api/doctors/')
+        self.doctor.user.first_name = 'Grace'
+        self.doctor.user.save()
+        self.assertEqual(self.client.get('/api/doctors/').data['results'][0]['user']['first_name'], 'Grace')
+
+    def test_availability_change_invalidates_detail(self):
+        self.client.get(self.detail_url)
+        availability = self.doctor.availabilities.get()
+        availability.end_time = time(10)
+        availability.save()
+        [row] = self.client.get(self.detail_url).data['availabilities']
+        self.assertEqual(row['end_time'], '10:00:00')
+
+    def test_unknown_doctor_leaves_no_cache_entry(self):
+        self.assertEqual(self.client.get('/api/doctors/999/').status_code, 404)
+        self.assertIsNone(cache.get(_generation_key(doctor_scope(999))))
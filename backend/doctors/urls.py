@@ -3,6 +3,7 @@ from .views import (
     DoctorListView, DoctorDetailView, SpecializationListView, doctors_by_specialization,
     AdminDoctorCreateView, AdminDoctorListView, AdminDoctorDetailView
 )
+from . import async_views
 
 urlpatterns = [
     path('doctors/', DoctorListView.as_view(), name='doctor-list'),
@@ -10,6 +11,10 @@ urlpatterns = [
     path('specializations/', SpecializationListView.as_view(), name='specialization-list'),
     path('doctors/specialization/<int:specialization_id>/', doctors_by_specialization, name='doctors-by-specialization'),
     
+    # Async variants
+    path('async/doctors/', async_views.doctor_list, name='async-doctor-list'),
+    path('async/specializations/', async_views.specialization_list, name='async-specialization-list'),
+    
     # Admin URLs
     path('admin/doctors/', AdminDoctorCreateView.as_view(), name='admin-doctor-create'),
     path('admin/doctors/list/', AdminDoctorListView.as_view(), name='admin-doctor-list'),
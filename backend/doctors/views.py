@@ -1,38 +1,78 @@
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from .models import Doctor, Specialization
 from .serializers import DoctorSerializer, DoctorListSerializer, SpecializationSerializer
 from users.models import CustomUser
+from appointment_system.pagination import DoctorCursorPagination
+from appointment_system.routers import use_replica
+from .search import filter_doctors, InvalidSearch
+from .cache import DirectoryCacheMixin, cached_response, doctor_scope, DOCTORS_SCOPE, SPECIALIZATIONS_SCOPE
 
-class DoctorListView(generics.ListAPIView):
-    queryset = Doctor.objects.filter(is_available=True)
+# Related rows rendered by DoctorListSerializer / DoctorSerializer
+LIST_RELATED = ('user', 'specialization')
+DETAIL_PREFETCH = ('availabilities',)
+
+@use_replica
+class DoctorListView(DirectoryCacheMixin, generics.ListAPIView):
+    queryset = Doctor.objects.filter(is_available=True).select_related(*LIST_RELATED)
     serializer_class = DoctorListSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = DoctorCursorPagination
+    
+    def get_cache_scopes(self):
+        return [DOCTORS_SCOPE]
+    
+    def get_queryset(self):
+        # ?q=, ?specialization=, ?min_fee=/?max_fee=, ?min_experience=/?max_experience=
+        return filter_doctors(super().get_queryset(), self.request.query_params)
+    
+    def list(self, request, *args, **kwargs):
+        try:
+            return super().list(request, *args, **kwargs)
+        except InvalidSearch as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-class DoctorDetailView(generics.RetrieveAPIView):
-    queryset = Doctor.objects.all()
+@use_replica
+class DoctorDetailView(DirectoryCacheMixin, generics.RetrieveAPIView):
+    queryset = Doctor.objects.select_related(*LIST_RELATED).prefetch_related(*DETAIL_PREFETCH)
     serializer_class = DoctorSerializer
     permission_classes = [permissions.AllowAny]
+    
+    def get_cache_scopes(self):
+        return [doctor_scope(self.kwargs['pk'])]
 
-class SpecializationListView(generics.ListAPIView):
+@use_replica
+class SpecializationListView(DirectoryCacheMixin, generics.ListAPIView):
     queryset = Specialization.objects.all()
     serializer_class = SpecializationSerializer
     permission_classes = [permissions.AllowAny]
+    
+    def get_cache_scopes(self):
+        return [SPECIALIZATIONS_SCOPE]
 
+@use_replica
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def doctors_by_specialization(request, specialization_id):
-    try:
-        doctors = Doctor.objects.filter(specialization_id=specialization_id, is_available=True)
-        serializer = DoctorListSerializer(doctors, many=True)
-        return Response(serializer.data)
-    except Exception as e:
-        return Response({'error': str(e)}, status=400)
+    def build():
+        try:
+            doctors = Doctor.objects.filter(
+                specialization_id=specialization_id, is_available=True
+            ).select_related(*LIST_RELATED)
+            serializer = DoctorListSerializer(doctors, many=True)
+            return Response(serializer.data)
+        except Exception as e:
+            return Response({'error': str(e)}, status=400)
+    
+    return cached_response(request, [DOCTORS_SCOPE], build)
 
 # Admin views for doctor management
 class AdminDoctorCreateView(generics.CreateAPIView):
     serializer_class = DoctorSerializer
+    # Admin writes re-check the user row so a revoked admin is refused at once
+    authentication_classes = [JWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     
     def create(self, request, *args, **kwargs):
@@ -68,25 +108,28 @@ class AdminDoctorCreateView(generics.CreateAPIView):
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+@use_replica
 class AdminDoctorListView(generics.ListAPIView):
     queryset = Doctor.objects.all()
     serializer_class = DoctorSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = DoctorCursorPagination
     
     def get_queryset(self):
         if self.request.user.user_type != 'admin':
             return Doctor.objects.none()
-        return Doctor.objects.all()
+        return Doctor.objects.select_related(*LIST_RELATED).prefetch_related(*DETAIL_PREFETCH)
 
 class AdminDoctorDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Doctor.objects.all()
     serializer_class = DoctorSerializer
+    authentication_classes = [JWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
         if self.request.user.user_type != 'admin':
             return Doctor.objects.none()
-        return Doctor.objects.all()
+        return Doctor.objects.select_related(*LIST_RELATED).prefetch_related(*DETAIL_PREFETCH)
     
     def destroy(self, request, *args, **kwargs):
         if request.user.user_type != 'admin':
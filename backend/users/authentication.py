@@ -0,0 +1,53 @@
+from asgiref.sync import sync_to_async
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from .tokens import USER_TYPE_CLAIM, DOCTOR_ID_CLAIM
+
+
+class ClaimsUser(TokenUser):
+    """request.user built from the access token's claims, without a database row.
+
+    Exposes id, user_type and doctor_id like CustomUser. Views that need the
+    model instance, or must see a deactivated user or a changed role right away,
+    authenticate with JWTAuthentication instead.
+    """
+
+    @cached_property
+    def user_type(self):
+        return self.token[USER_TYPE_CLAIM]
+
+    @cached_property
+    def doctor_id(self):
+        return self.token.get(DOCTOR_ID_CLAIM)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWT authentication that trusts the token's claims instead of loading the user.
+
+    Admin tokens, and tokens issued before the claims were added, fall back to the
+    database lookup, so a demoted or deactivated admin loses access right away.
+    """
+
+    def get_user(self, validated_token):
+        if validated_token.get(USER_TYPE_CLAIM, 'admin') == 'admin':
+            return super().get_user(validated_token)
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('Token contained no recognizable user identification')
+        return api_settings.TOKEN_USER_CLASS(validated_token)
+
+
+def _authenticate(request):
+    try:
+        result = ClaimsJWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+async def aauthenticate(request):
+    """The JWT-authenticated user for a plain Django async view, or None."""
+    return await sync_to_async(_authenticate)(request)
@@ -0,0 +1,113 @@
+"""
+Measure the time login-path logging adds to a request when many threads log
+at once: the old synchronous handler with eager f-strings against the
+queue handler with lazy formatting and redaction from settings.LOGGING.
+
+--sink-latency-ms makes every write to the log stream that much slower,
+standing in for a busy disk, terminal or log shipper.
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+from django.core.management.base import BaseCommand
+from appointment_system.benchmarks import summarize
+from appointment_system.log import JsonFormatter, QueueLogHandler, RedactFilter
+
+
+class SlowStream:
+    def __init__(self, stream, latency):
+        self.stream = stream
+        self.latency = latency
+
+    def write(self, text):
+        time.sleep(self.latency)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def old_login_logging(logger, payload):
+    logger.info(f"Login attempt with data: {payload}")
+    logger.info("Login data is valid")
+    logger.info(f"User logged in successfully: {payload['username']}")
+
+
+def new_login_logging(logger, payload):
+    logger.info('Login attempt for %s', payload['username'])
+    logger.debug('Login data is valid')
+    logger.info('User logged in: %s', payload['username'], extra={'user_id': 1})
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request latency of synchronous and queued login logging under concurrency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=32)
+        parser.add_argument('--logins', type=int, default=300, help='Logins per thread')
+        parser.add_argument('--sink-latency-ms', type=float, default=0.2)
+
+    def handle(self, *args, **options):
+        payload = {
+            'username': 'patient42',
+            'password': 'correct horse battery staple',
+            'device': {'platform': 'web', 'user_agent': 'Mozilla/5.0 ' * 8},
+        }
+        latency = options['sink_latency_ms'] / 1000
+
+        with tempfile.TemporaryDirectory() as directory:
+            for label, make_handler, log_login in (
+                ('sync handler, f-strings', self.sync_handler, old_login_logging),
+                ('queue handler, lazy', self.queue_handler, new_login_logging),
+            ):
+                with open(os.path.join(directory, 'bench.log'), 'w') as stream:
+                    handler = make_handler(SlowStream(stream, latency))
+                    logger = logging.getLogger(f'bench_logging.{label}')
+                    logger.propagate = False
+                    logger.setLevel(logging.INFO)
+                    logger.addHandler(handler)
+
+                    samples = self.run(logger, log_login, payload, options['threads'], options['logins'])
+                    started = time.perf_counter()
+                    handler.close()
+                    drained = (time.perf_counter() - started) * 1000
+                    logger.removeHandler(handler)
+
+                stats = summarize(samples)
+                self.stdout.write(
+                    f'{label:<26} per login: p50 {stats["p50"]:.3f}  p99 {stats["p99"]:.3f}  max {stats["max"]:.3f} ms'
+                    f'  (flush at close {drained:.0f} ms)'
+                )
+
+    def sync_handler(self, stream):
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s %(message)s'))
+        return handler
+
+    def queue_handler(self, stream):
+        handler = QueueLogHandler(stream)
+        handler.setFormatter(JsonFormatter())
+        handler.addFilter(RedactFilter())
+        return handler
+
+    def run(self, logger, log_login, payload, threads, logins):
+        samples = []
+        lock = threading.Lock()
+
+        def worker():
+            local = []
+            for _ in range(logins):
+                started = time.perf_counter()
+                log_login(logger, payload)
+                local.append((time.perf_counter() - started) * 1000)
+            with lock:
+                samples.extend(local)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return samples
@@ -0,0 +1,109 @@
+"""
+Measure the login path on a scratch database: password logins per second for
+each tunable hasher in settings.PASSWORD_HASHERS, token refreshes per second,
+and how cheaply the login throttles turn away a password-guessing burst.
+
+Run it single-threaded to see what one core can do; hasher cost dominates a
+password login, while a refresh only verifies and signs a token.
+"""
+import logging
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from appointment_system.benchmarks import api_client, scratch_database, summarize
+from users.models import CustomUser
+from users.views import UserLoginView
+
+PASSWORD = 'bench-password-123'
+TUNABLE_HASHERS = [path for path in settings.PASSWORD_HASHERS if path.startswith('users.hashers.')]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark password logins per hasher, token refreshes and throttled login attempts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=20, help='Password logins per hasher')
+        parser.add_argument('--refreshes', type=int, default=500)
+        parser.add_argument('--attempts', type=int, default=200, help='Wrong-password attempts in the burst')
+
+    def handle(self, *args, **options):
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        if not any('Argon2' in path for path in TUNABLE_HASHERS):
+            self.stdout.write('argon2-cffi is not installed; skipping Argon2')
+
+        with scratch_database():
+            cache.clear()
+            for path in TUNABLE_HASHERS:
+                with override_settings(PASSWORD_HASHERS=[path]):
+                    self.bench_logins(path.rsplit('.', 1)[-1], options['logins'])
+            self.bench_refresh(options['refreshes'])
+            self.bench_throttle(options['attempts'])
+            cache.clear()
+
+    def report(self, label, samples, elapsed, extra=''):
+        stats = summarize(samples)
+        self.stdout.write(
+            f'{label:<36} {len(samples) / elapsed:8.1f} /s  p50 {stats["p50"]:7.2f}  p99 {stats["p99"]:7.2f} ms{extra}'
+        )
+
+    def timed(self, calls, fn):
+        samples, results = [], []
+        started = time.perf_counter()
+        for _ in range(calls):
+            began = time.perf_counter()
+            results.append(fn())
+            samples.append((time.perf_counter() - began) * 1000)
+        return samples, results, time.perf_counter() - started
+
+    def bench_logins(self, label, logins):
+        username = f'bench-{label.lower()}'
+        user = CustomUser(username=username)
+        user.set_password(PASSWORD)
+        user.save()
+        client = api_client()
+        credentials = {'username': username, 'password': PASSWORD}
+
+        # Throttling is measured separately; here every login must reach the hasher
+        throttles, UserLoginView.throttle_classes = UserLoginView.throttle_classes, []
+        try:
+            samples, responses, elapsed = self.timed(
+                logins, lambda: client.post('/api/auth/login/', credentials, format='json')
+            )
+        finally:
+            UserLoginView.throttle_classes = throttles
+        assert all(response.status_code == 200 for response in responses), 'login failed'
+        self.report(f'login, {label}', samples, elapsed)
+
+    def bench_refresh(self, refreshes):
+        user = CustomUser.objects.create_user(username='bench-refresh', password=PASSWORD)
+        client = api_client()
+        cache.clear()
+        refresh = client.post(
+            '/api/auth/login/', {'username': user.username, 'password': PASSWORD}, format='json'
+        ).data['refresh']
+        samples, responses, elapsed = self.timed(
+            refreshes, lambda: client.post('/api/auth/token/refresh/', {'refresh': refresh}, format='json')
+        )
+        assert all(response.status_code == 200 for response in responses), 'refresh failed'
+        self.report('token refresh', samples, elapsed)
+
+    def bench_throttle(self, attempts):
+        CustomUser.objects.create_user(username='bench-target', password=PASSWORD)
+        client = api_client()
+        cache.clear()
+        credentials = {'username': 'bench-target', 'password': 'wrong-guess'}
+        samples, responses, elapsed = self.timed(
+            attempts, lambda: client.post('/api/auth/login/', credentials, format='json')
+        )
+        rejected = [ms for ms, response in zip(samples, responses) if response.status_code == 429]
+        checked = [ms for ms, response in zip(samples, responses) if response.status_code != 429]
+        self.report(
+            'wrong-password burst', samples, elapsed,
+            f'  hashed: {len(checked)}  throttled: {len(rejected)}'
+        )
+        if rejected:
+            self.report('  throttled attempts only', rejected, sum(rejected) / 1000)
+        if checked:
+            self.report('  hashed attempts only', checked, sum(checked) / 1000)
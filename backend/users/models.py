@@ -1,5 +1,7 @@
 from django.contrib.auth.models import AbstractUser
+from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
+from django.utils.functional import cached_property
 
 class CustomUser(AbstractUser):
     USER_TYPE_CHOICES = (
@@ -17,6 +19,16 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return f"{self.username} - {self.get_user_type_display()}"
     
+    @cached_property
+    def doctor_id(self):
+        # Same attribute as the token-backed ClaimsUser
+        if self.user_type != 'doctor':
+            return None
+        try:
+            return self.doctor_profile.id
+        except ObjectDoesNotExist:
+            return None
+    
     class Meta:
         verbose_name = 'User'
         verbose_name_plural = 'Users'
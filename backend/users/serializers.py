@@ -1,6 +1,10 @@
 from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from django.contrib.auth import authenticate
 from .models import CustomUser
+from .tokens import UserRefreshToken, USER_TYPE_CLAIM, DOCTOR_ID_CLAIM
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
@@ -54,3 +58,32 @@ class UserProfileSerializer(serializers.ModelSerializer):
         model = CustomUser
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'phone_number', 'address', 'date_of_birth', 'profile_picture', 'user_type']
         read_only_fields = ['id', 'username', 'user_type']
+
+class UserTokenRefreshSerializer(TokenRefreshSerializer):
+    """Token refresh that reloads the user.
+
+    Inactive or deleted users are refused, and the role claims are re-read from
+    the database rather than copied from the old token.
+    """
+    token_class = UserRefreshToken
+    
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = CustomUser.objects.select_related('doctor_profile').filter(
+            **{api_settings.USER_ID_FIELD: refresh[api_settings.USER_ID_CLAIM]}
+        ).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed('No active account found for this token', code='no_active_account')
+        
+        refresh[USER_TYPE_CLAIM] = user.user_type
+        refresh[DOCTOR_ID_CLAIM] = user.doctor_id
+        data = {'access': str(refresh.access_token)}
+        
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
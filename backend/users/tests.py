@@ -0,0 +1,69 @@
+from datetime import date, time, timedelta
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from appointments.models import Appointment
+from doctors.models import Doctor, DoctorAvailability, Specialization
+from .models import CustomUser
+from .tokens import UserRefreshToken
+
+
+class AdminClaimsTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='password123', user_type='admin')
+        patient = CustomUser.objects.create_user(username='patient', password='password123')
+        doctor_user = CustomUser.objects.create_user(username='doctor', password='password123', user_type='doctor')
+        doctor = Doctor.objects.create(
+            user=doctor_user, specialization=Specialization.objects.create(name='Cardiology'),
+            license_number='L1', consultation_fee=100
+        )
+        DoctorAvailability.objects.create(doctor=doctor, day='monday', start_time=time(9), end_time=time(12))
+        self.appointment = Appointment.objects.create(
+            patient=patient, doctor=doctor, appointment_date=date.today() + timedelta(days=7), appointment_time=time(9)
+        )
+        self.client = APIClient()
+        token = UserRefreshToken.for_user(self.admin).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_admin_token(self):
+        self.assertEqual(self.client.get('/api/appointments/').data['results'][0]['id'], self.appointment.id)
+
+    def test_demoted_admin_loses_admin_access(self):
+        CustomUser.objects.filter(id=self.admin.id).update(user_type='user')
+        self.assertEqual(self.client.get('/api/appointments/').data['results'], [])
+        response = self.client.patch(f'/api/appointments/{self.appointment.id}/', {'notes': 'x'}, format='json')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get('/api/admin/doctors/list/').data['results'], [])
+
+    def test_deactivated_admin_is_rejected(self):
+        CustomUser.objects.filter(id=self.admin.id).update(is_active=False)
+        self.assertEqual(self.client.get('/api/appointments/').status_code, 401)
+        response = self.client.post(f'/api/appointments/{self.appointment.id}/cancel/')
+        self.assertEqual(response.status_code, 401)
+
+
+class TokenRefreshTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='admin', password='password123', user_type='admin')
+        self.refresh = str(UserRefreshToken.for_user(self.user))
+        self.client = APIClient()
+
+    def test_refresh_restamps_claims(self):
+        CustomUser.objects.filter(id=self.user.id).update(user_type='user')
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': self.refresh}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AccessToken(response.data['access'])['user_type'], 'user')
+
+    def test_inactive_user_cannot_refresh(self):
+        CustomUser.objects.filter(id=self.user.id).update(is_active=False)
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': self.refresh}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+
+class MalformedBodyTests(TestCase):
+    def test_non_object_body_is_a_bad_request(self):
+        client = APIClient()
+        for path in ('/api/auth/login/', '/api/auth/register/'):
+            for body in (['admin'], 'admin', 42):
+                with self.subTest(path=path, body=body):
+                    self.assertEqual(client.post(path, body, format='json').status_code, 400)
@@ -0,0 +1,23 @@
+"""
+Login throttles. They run in the view's initial() checks, before the
+serializer calls authenticate(), so rejected attempts never reach the
+password hasher. Counters live in the default cache.
+"""
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class LoginIPThrottle(SimpleRateThrottle):
+    scope = 'login_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LoginUsernameThrottle(SimpleRateThrottle):
+    scope = 'login_username'
+
+    def get_cache_key(self, request, view):
+        username = request.data.get('username') if isinstance(request.data, dict) else None
+        if not isinstance(username, str) or not username.strip():
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': username.strip().lower()}
@@ -0,0 +1,21 @@
+from rest_framework_simplejwt.tokens import RefreshToken
+
+# Claims ClaimsJWTAuthentication builds request.user from
+USER_TYPE_CLAIM = 'user_type'
+DOCTOR_ID_CLAIM = 'doctor_id'
+
+
+class UserRefreshToken(RefreshToken):
+    """Refresh token carrying the user's type and doctor profile id.
+
+    The claims are copied into every access token minted from it. They stay as
+    they were at login until the token is refreshed, which re-reads them from
+    the user row (UserTokenRefreshSerializer).
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token[USER_TYPE_CLAIM] = user.user_type
+        token[DOCTOR_ID_CLAIM] = user.doctor_id
+        return token
@@ -1,9 +1,13 @@
 from django.urls import path
+from rest_framework_simplejwt.views import TokenRefreshView
+from .serializers import UserTokenRefreshSerializer
 from .views import UserRegistrationView, UserLoginView, UserProfileView, logout
 
 urlpatterns = [
     path('auth/register/', UserRegistrationView.as_view(), name='user-register'),
     path('auth/login/', UserLoginView.as_view(), name='user-login'),
     path('auth/logout/', logout, name='user-logout'),
+    # Trades a refresh token for a new access token without re-checking the password
+    path('auth/token/refresh/', TokenRefreshView.as_view(serializer_class=UserTokenRefreshSerializer), name='token-refresh'),
     path('auth/profile/', UserProfileView.as_view(), name='user-profile'),
 ]
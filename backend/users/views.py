@@ -2,56 +2,69 @@ from rest_framework import status, generics
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
 import logging
+from appointment_system import metrics
 from .serializers import UserRegistrationSerializer, UserLoginSerializer, UserProfileSerializer
 from .models import CustomUser
+from .throttles import LoginIPThrottle, LoginUsernameThrottle
+from .tokens import UserRefreshToken
 
 logger = logging.getLogger(__name__)
 
+def submitted_username(request):
+    # For logging only: the body may be a JSON list or scalar, which the serializer rejects
+    return request.data.get('username') if isinstance(request.data, dict) else None
+
 class UserRegistrationView(generics.CreateAPIView):
     queryset = CustomUser.objects.all()
     permission_classes = [AllowAny]
     serializer_class = UserRegistrationSerializer
     
     def create(self, request, *args, **kwargs):
-        logger.info(f"Registration attempt with data: {request.data}")
+        logger.info('Registration attempt for %s', submitted_username(request))
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
-            logger.info("Registration data is valid")
+            logger.debug('Registration data is valid')
             user = serializer.save()
-            logger.info(f"User created successfully: {user.username}")
+            logger.info('User created: %s', user.username, extra={'user_id': user.id})
             return Response({
                 'message': 'User registered successfully',
                 'user_id': user.id
             }, status=status.HTTP_201_CREATED)
         else:
-            logger.error(f"Registration validation failed: {serializer.errors}")
+            logger.warning('Registration validation failed: %s', serializer.errors)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class UserLoginView(generics.GenericAPIView):
     permission_classes = [AllowAny]
+    throttle_classes = [LoginIPThrottle, LoginUsernameThrottle]
     serializer_class = UserLoginSerializer
     
     def post(self, request):
-        logger.info(f"Login attempt with data: {request.data}")
+        logger.info('Login attempt for %s', submitted_username(request))
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
-            logger.info("Login data is valid")
+            logger.debug('Login data is valid')
             user = serializer.validated_data['user']
-            refresh = RefreshToken.for_user(user)
-            logger.info(f"User logged in successfully: {user.username}")
+            refresh = UserRefreshToken.for_user(user)
+            logger.info('User logged in: %s', user.username, extra={'user_id': user.id})
+            metrics.LOGINS.inc(result='success')
             return Response({
                 'refresh': str(refresh),
                 'access': str(refresh.access_token),
                 'user': UserProfileSerializer(user).data
             })
         else:
-            logger.error(f"Login validation failed: {serializer.errors}")
+            logger.warning('Login validation failed: %s', serializer.errors)
+            metrics.LOGINS.inc(result='failure')
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class UserProfileView(generics.RetrieveUpdateAPIView):
+    # Edits the user row itself, so load it rather than trusting token claims
+    authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = UserProfileSerializer
     